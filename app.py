@@ -1,10 +1,32 @@
+import cProfile
 import csv
+import functools
+import gzip
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
 import unicodedata
-from io import StringIO
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from io import BytesIO, StringIO
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+# pyarrow es opcional: lector CSV multihilo y descargas Parquet/Feather
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
 # Índices 0-based por letra:
 # A=0 B=1 C=2 D=3 E=4 F=5 G=6 H=7 I=8 J=9 K=10 L=11 M=12 N=13 O=14
 IDX_A_SHIPMENT_ID = 0
@@ -22,6 +44,26 @@ IDX_O_RANGE = 14              # O = RANGO DIFERENCIA
 
 MIN_COLS_A_TO_O = 15  # A..O
 
+CACHE_MAX_BYTES = 1024 ** 3  # caché de resultados de la app, compartida entre sesiones
+PROCESS_WORKERS = min(32, os.cpu_count() or 1)  # procesos del motor paralelo y de la carga múltiple (parallel.py)
+CSV_CHUNK_ROWS = 100_000  # filas por bloque al escribir CSV (descargas y cli.py)
+
+# Vista rápida (quick_scan): primeras filas + bloques al azar; intervalo del 95 %
+QUICK_SCAN_HEAD_ROWS = 5_000
+QUICK_SCAN_BLOCKS = 30
+QUICK_SCAN_BLOCK_ROWS = 200
+QUICK_SCAN_Z = 1.96
+
+# Mismos valores que pandas trata como NaN con keep_default_na=True (para el lector Arrow)
+CSV_NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+# Etapas del pipeline: por defecto trabajan sobre una copia del DataFrame recibido.
+# Con copy=False escriben directamente en `df` y solo tocan las columnas que cambian
+# (N, K, L, J, O); process() hace una única copia al inicio y encadena las etapas así.
+
 
 def sniff_delimiter(text: str) -> str:
     try:
@@ -77,11 +119,127 @@ def clean_bol_key(x) -> str:
     return s
 
 
-def ensure_min_columns(df: pd.DataFrame, has_header: bool) -> pd.DataFrame:
+def clean_date_str(x):
+    """String de fecha limpio, o None si está en blanco o es "No Valido"."""
+    if is_blank(x):
+        return None
+    nv = normalize_text_for_compare(x)
+    if nv == "no valido" or nv.startswith("no valido"):
+        return None
+    return str(x).strip()
+
+
+# Versión vectorizada de is_blank / "No Valido" / clean_date_str: cada valor distinto
+# de la columna se limpia una sola vez (factorize) y solo los candidatos a "No Valido"
+# pasan por normalize_text_for_compare (memoizado).
+_NON_ASCII = r"[^\x00-\x7F]"
+
+
+@functools.lru_cache(maxsize=65536)
+def _is_no_valido_text(s: str) -> bool:
+    return normalize_text_for_compare(s).startswith("no valido")
+
+
+class TextValues:
+    """
+    Valores distintos de una columna, limpios:
+    - codes: código por fila (-1 = None/NaN)
+    - stripped: string sin espacios en los extremos, por valor distinto
+    - blank / no_valido: máscaras por valor distinto (is_blank / normalize_text_for_compare)
+    """
+
+    def __init__(self, series: pd.Series):
+        self.index = series.index
+        self.codes, uniques = pd.factorize(series)
+        stripped = pd.Series(uniques, dtype=object).astype(str).str.strip()
+        self.stripped = stripped.to_numpy(dtype=object)
+        self.blank = (stripped == "").to_numpy(dtype=bool)
+
+        # En ASCII la normalización solo baja a minúsculas y colapsa espacios: si no empieza
+        # con "n" no puede ser "No Valido". Lo demás (tildes, anchos completos) se normaliza.
+        candidate = stripped.str.lower().str.startswith("n") | stripped.str.contains(_NON_ASCII, regex=True)
+        candidate = candidate.to_numpy(dtype=bool) & ~self.blank
+        self.no_valido = np.zeros(len(stripped), dtype=bool)
+        self.no_valido[candidate] = [_is_no_valido_text(s) for s in self.stripped[candidate]]
+
+    def blank_mask(self) -> np.ndarray:
+        """is_blank por fila."""
+        return take_codes(self.blank, self.codes, fill=True)
+
+    def no_valido_mask(self) -> np.ndarray:
+        """"No Valido" por fila (sin contar los blancos)."""
+        return take_codes(self.no_valido, self.codes, fill=False)
+
+    def invalid_mask(self) -> np.ndarray:
+        """En blanco o "No Valido", por fila."""
+        return take_codes(self.blank | self.no_valido, self.codes, fill=True)
+
+    def values(self, drop_no_valido: bool = False) -> pd.Series:
+        """Strings limpios por fila; None si en blanco (y si es "No Valido" con drop_no_valido)."""
+        drop = self.blank | self.no_valido if drop_no_valido else self.blank
+        per_code = np.where(drop, None, self.stripped)
+        return pd.Series(take_codes(per_code, self.codes, fill=None), index=self.index, dtype=object)
+
+
+def blank_mask(series: pd.Series) -> np.ndarray:
+    """is_blank vectorizado."""
+    return TextValues(series).blank_mask()
+
+
+def clean_text_values(series: pd.Series) -> pd.Series:
+    """Strings sin espacios en los extremos; None si están en blanco."""
+    return TextValues(series).values()
+
+
+def clean_date_values(series: pd.Series) -> pd.Series:
+    """clean_date_str vectorizado: None si está en blanco o es "No Valido"."""
+    return TextValues(series).values(drop_no_valido=True)
+
+
+# Columnas de texto con muchos valores repetidos: como categóricas cada valor distinto se
+# guarda una vez y cada fila es un código entero (el CSV exportado no cambia).
+# Al leer: B/C (tipo, BOL), G/H (fechas) y cualquier otra columna con pocos valores distintos
+# (salvo J..O, que el pipeline reescribe). K/L/N/O al terminar process().
+# J queda float64: en float32 cambiarían los decimales exportados ("%.2f") y los bordes de O.
+COMPACT_INPUT_COLUMNS = [IDX_B_SHIPMENT_TYPE, IDX_C_BOL, IDX_G_ESTIMATED, IDX_H_ACTUAL]
+COMPACT_OUTPUT_COLUMNS = [IDX_K_MIN, IDX_L_MAX, IDX_N_PRIORITIZED, IDX_O_RANGE]
+COMPACT_MAX_UNIQUE_RATIO = 0.5
+COMPACT_SAMPLE_SIZE = 10_000
+
+
+def repeated_text_columns(df: pd.DataFrame) -> list:
+    """Posiciones de columnas de entrada (fuera de J..O) con pocos valores distintos en una muestra."""
+    step = max(1, len(df) // COMPACT_SAMPLE_SIZE)
+    sample = df.iloc[::step]
+    out = []
+    for pos in range(df.shape[1]):
+        if IDX_J_DIFF_HOURS <= pos <= IDX_O_RANGE or pos in COMPACT_INPUT_COLUMNS:
+            continue
+        col = sample.iloc[:, pos]
+        if pd.api.types.is_numeric_dtype(col) or isinstance(col.dtype, pd.CategoricalDtype):
+            continue
+        if col.nunique(dropna=False) <= COMPACT_MAX_UNIQUE_RATIO * max(1, len(col)):
+            out.append(pos)
+    return out
+
+
+def compact_dtypes(df: pd.DataFrame, positions: list, copy: bool = True) -> pd.DataFrame:
+    """Pasa a categóricas las columnas de texto en `positions` (las que ya lo son no se tocan)."""
+    if copy:
+        df = df.copy()
+    for pos in positions:
+        col = df.iloc[:, pos]
+        if not isinstance(col.dtype, pd.CategoricalDtype) and not pd.api.types.is_numeric_dtype(col):
+            df.isetitem(pos, col.astype("category"))
+    return df
+
+
+def ensure_min_columns(df: pd.DataFrame, has_header: bool, copy: bool = True) -> pd.DataFrame:
     """
     Asegura al menos A..O (15 columnas). Si faltan, agrega columnas vacías al final.
     """
-    df = df.copy()
+    if copy:
+        df = df.copy()
     missing = MIN_COLS_A_TO_O - df.shape[1]
     if missing <= 0:
         return df
@@ -130,147 +288,373 @@ def parse_dates(series: pd.Series, mode: str, dayfirst=None) -> pd.Series:
     return dt_dmy if dt_dmy.notna().sum() > dt_mdy.notna().sum() else dt_mdy
 
 
-def compute_valor_priorizado(df: pd.DataFrame) -> pd.DataFrame:
+# Formatos explícitos candidatos por modo (dayfirst False = MDY, True = DMY).
+# Parsear con formato fijo es mucho más rápido que inferir valor por valor.
+_ISO_AND_YMD_FORMATS = ["ISO8601", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M", "%Y/%m/%d"]
+DATE_FORMAT_CANDIDATES = {
+    False: _ISO_AND_YMD_FORMATS + [
+        "%m/%d/%Y %H:%M", "%m/%d/%Y %H:%M:%S", "%m/%d/%Y %I:%M %p", "%m/%d/%Y %I:%M:%S %p", "%m/%d/%Y",
+        "%m-%d-%Y %H:%M", "%m-%d-%Y %H:%M:%S", "%m-%d-%Y", "%m/%d/%y %H:%M", "%m/%d/%y",
+    ],
+    True: _ISO_AND_YMD_FORMATS + [
+        "%d/%m/%Y %H:%M", "%d/%m/%Y %H:%M:%S", "%d/%m/%Y %I:%M %p", "%d/%m/%Y %I:%M:%S %p", "%d/%m/%Y",
+        "%d-%m-%Y %H:%M", "%d-%m-%Y %H:%M:%S", "%d-%m-%Y", "%d.%m.%Y %H:%M", "%d.%m.%Y",
+        "%d/%m/%y %H:%M", "%d/%m/%y",
+    ],
+}
+DATE_FORMAT_SAMPLE_SIZE = 500
+
+
+class DateStore:
+    """
+    Fechas parseadas compartidas por todas las etapas:
+    - cada string distinto se parsea UNA sola vez por modo (MDY / DMY)
+    - por modo se detecta un formato explícito (muestra de DATE_FORMAT_SAMPLE_SIZE valores
+      contra DATE_FORMAT_CANDIDATES); solo lo que no calza con él se parsea por inferencia
+    - en AUTO la elección dayfirst se resuelve una sola vez para todo el archivo
+      (cantidad de parseos de G/H), no en cada etapa ni en cada grupo
+
+    `fallback_count`: valores de G/H registrados que necesitaron inferencia.
+    `formats` permite fijar los formatos ya detectados (ej: modo incremental).
+    """
+
+    def __init__(self, date_mode: str, dayfirst=None, formats: dict = None):
+        self.date_mode = date_mode
+        if date_mode == "MDY":
+            dayfirst = False
+        elif date_mode == "DMY":
+            dayfirst = True
+        self.dayfirst = dayfirst
+        self.formats = dict(formats or {})  # dayfirst -> formato detectado ("" = ninguno, solo inferencia)
+        self.fallback_count = 0
+        self._exact = {False: None, True: None}  # dayfirst -> Series(str -> datetime), solo formato detectado
+        self._parsed = {False: None, True: None}  # dayfirst -> Series(str -> datetime), con inferencia
+        self._fallback = {False: None, True: None}  # dayfirst -> Series(str -> bool), True = por inferencia
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, date_mode: str, dayfirst=None, formats: dict = None) -> "DateStore":
+        """Registra las fechas de G/H (todas las demás columnas de fecha salen de ellas)."""
+        store = cls(date_mode, dayfirst=dayfirst, formats=formats)
+        values = pd.concat([df.iloc[:, IDX_H_ACTUAL], df.iloc[:, IDX_G_ESTIMATED]], ignore_index=True)
+        store.register(clean_date_values(values))
+        return store
+
+    @staticmethod
+    def detect_format(values: pd.Series, dayfirst: bool) -> str:
+        """Candidato que parsea más valores de una muestra; "" si ninguno parsea nada."""
+        step = max(1, len(values) // DATE_FORMAT_SAMPLE_SIZE)
+        sample = values.iloc[::step].iloc[:DATE_FORMAT_SAMPLE_SIZE]
+        best, best_ok = "", 0
+        for fmt in DATE_FORMAT_CANDIDATES[dayfirst]:
+            try:
+                ok = int(pd.to_datetime(sample, format=fmt, errors="coerce").notna().sum())
+            except (ValueError, TypeError):
+                continue
+            if ok > best_ok:
+                best, best_ok = fmt, ok
+        return best
+
+    @staticmethod
+    def parse_each(values: pd.Series, dayfirst: bool) -> pd.Series:
+        """
+        Inferencia valor por valor (format="mixed"): en un lote pandas toma el formato del
+        primer valor y deja en NaT los de otro formato. Los ISO van primero con su formato
+        fijo: con dayfirst=True, "mixed" leería "2024-01-03" como 1 de marzo.
+        """
+        parsed = pd.to_datetime(values, format="ISO8601", errors="coerce")
+        rest = parsed.isna().to_numpy() & values.notna().to_numpy()
+        if rest.any():
+            parsed = parsed.copy()
+            parsed[rest] = pd.to_datetime(values[rest], format="mixed", errors="coerce", dayfirst=dayfirst).to_numpy()
+        return parsed
+
+    def _lookup_exact(self, uniques, dayfirst: bool) -> pd.Series:
+        """Fechas con el formato detectado (NaT si no calza); sin formato, por inferencia."""
+        if dayfirst not in self.formats:
+            self.formats[dayfirst] = self.detect_format(pd.Series(uniques, dtype=object), dayfirst)
+        fmt = self.formats[dayfirst]
+
+        cache = self._exact[dayfirst]
+        missing = uniques if cache is None else uniques[~pd.Index(uniques).isin(cache.index)]
+        if len(missing) or cache is None:
+            missing = pd.Series(missing, index=pd.Index(missing, dtype=object), dtype=object)
+            if fmt:
+                parsed = pd.to_datetime(missing, format=fmt, errors="coerce")
+            else:
+                parsed = self.parse_each(missing, dayfirst)
+            cache = parsed if cache is None else pd.concat([cache, parsed])
+            self._exact[dayfirst] = cache
+        return cache.reindex(uniques)
+
+    def _lookup(self, uniques, dayfirst: bool) -> pd.Series:
+        """
+        Fechas para `uniques` (strings distintos); parsea solo los que no están en caché.
+        Lo que no calza con el formato detectado se parsea por inferencia, valor por valor
+        (solo esos valores, ver parse_each).
+        """
+        cache = self._parsed[dayfirst]
+        missing = uniques if cache is None else uniques[~pd.Index(uniques).isin(cache.index)]
+        if len(missing) or cache is None:
+            missing = pd.Index(missing, dtype=object)
+            parsed = self._lookup_exact(missing, dayfirst)
+            if self.formats[dayfirst]:
+                fallback = parsed.isna()
+                if fallback.any():
+                    inferred = self.parse_each(pd.Series(missing[fallback.to_numpy()], dtype=object), dayfirst)
+                    parsed = parsed.copy()
+                    parsed[fallback.to_numpy()] = inferred.to_numpy()
+            else:
+                fallback = pd.Series(True, index=missing)
+
+            if cache is None:
+                cache, self._fallback[dayfirst] = parsed, fallback
+            else:
+                cache = pd.concat([cache, parsed])
+                self._fallback[dayfirst] = pd.concat([self._fallback[dayfirst], fallback])
+            self._parsed[dayfirst] = cache
+        return cache.reindex(uniques)
+
+    def count_parsed(self, values: pd.Series) -> dict:
+        """
+        Cantidad de filas de `values` que parsean como MDY (False) y como DMY (True).
+        Cuenta solo lo que calza con el formato detectado de cada modo: la inferencia
+        acepta casi cualquier fecha en ambos órdenes y no sirve para decidir AUTO.
+        """
+        return {dayfirst: int(self.parsed_mask(values, dayfirst).sum()) for dayfirst in (False, True)}
+
+    def parsed_mask(self, values: pd.Series, dayfirst: bool) -> np.ndarray:
+        """Por fila: True si el valor calza con el formato detectado del modo (ver count_parsed)."""
+        codes, uniques = pd.factorize(values)
+        ok = self._lookup_exact(uniques, dayfirst).notna().to_numpy()
+        return take_codes(ok, codes, fill=False)
+
+    def register(self, values: pd.Series) -> None:
+        """Parsea los strings distintos de `values` y, si falta, resuelve dayfirst (AUTO)."""
+        if self.dayfirst is None:
+            counts = self.count_parsed(values)
+            self.dayfirst = counts[True] > counts[False]
+
+        codes, uniques = pd.factorize(values)
+        self._lookup(uniques, self.dayfirst)
+        fallback = self._fallback[self.dayfirst].reindex(uniques).to_numpy(dtype=bool)
+        self.fallback_count += int(np.isin(codes, np.flatnonzero(fallback)).sum())
+
+    def to_datetime(self, values: pd.Series, dayfirst=None) -> pd.Series:
+        """Equivalente a parse_dates(values, mode), leyendo desde la caché (dayfirst fuerza el modo)."""
+        if dayfirst is None:
+            if self.dayfirst is None:
+                self.register(values)
+            dayfirst = self.dayfirst
+        codes, uniques = pd.factorize(values)
+        parsed = self._lookup(uniques, dayfirst)
+        out = parsed.iloc[np.where(codes >= 0, codes, 0)] if len(parsed) else parsed.reindex(range(len(codes)))
+        out = out.where(codes >= 0)
+        return pd.Series(out.to_numpy(), index=values.index, name=values.name)
+
+
+class RowIndex:
+    """
+    Clasificación de filas calculada una sola vez y compartida por todas las etapas:
+    - shipment_type: col B normalizada (normalize_type), como Categorical
+    - mask_container / mask_bol: máscaras booleanas (numpy)
+    - bol_codes: clave BOL limpia (col C, clean_bol_key) como enteros, -1 = en blanco;
+      bol_keys[code] es el string de la clave
+    Cada valor distinto de B y C se normaliza una sola vez.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        raw_codes, raw_types = pd.factorize(df.iloc[:, IDX_B_SHIPMENT_TYPE])
+        norm_codes, types = pd.factorize(pd.Series(raw_types, dtype=object).apply(normalize_type))
+        type_codes = take_codes(norm_codes, raw_codes)
+        self.shipment_type = pd.Categorical.from_codes(type_codes, categories=types)
+
+        labels = pd.Series(types, dtype=object)
+        is_container = labels.str.contains("CONTAINER") & ~labels.str.contains("BILL_OF_LADING")
+        is_bol = labels.str.contains("BILL_OF_LADING")
+        self.mask_container = take_codes(is_container.to_numpy(dtype=bool), type_codes, fill=False)
+        self.mask_bol = take_codes(is_bol.to_numpy(dtype=bool), type_codes, fill=False)
+
+        raw_codes, raw_keys = pd.factorize(df.iloc[:, IDX_C_BOL])
+        cleaned = pd.Series(raw_keys, dtype=object).apply(clean_bol_key)
+        key_codes, keys = pd.factorize(cleaned.where(cleaned != ""))
+        self.bol_codes = take_codes(key_codes, raw_codes)
+        self.bol_keys = np.asarray(keys, dtype=object)
+
+    @property
+    def single_key(self) -> bool:
+        """True si el archivo tiene 1 único valor (no vacío) en C."""
+        return len(self.bol_keys) == 1
+
+    def map_keys(self, mapping: dict, default="No Valido") -> np.ndarray:
+        """Valor de `mapping` (clave BOL -> valor) para cada fila; `default` si falta o C en blanco."""
+        per_key = pd.Series(self.bol_keys, dtype=object).map(mapping).fillna(default).to_numpy(dtype=object)
+        return take_codes(per_key, self.bol_codes, fill=default)
+
+    def by_key(self, by_code: pd.Series) -> dict:
+        """Series indexada por código BOL -> dict indexado por la clave (string)."""
+        return dict(zip(self.bol_keys[by_code.index.to_numpy(dtype=np.int64)], by_code.to_numpy()))
+
+
+def take_codes(per_code, codes: np.ndarray, fill=-1) -> np.ndarray:
+    """per_code[codes], con `fill` donde el código es -1 (faltante)."""
+    per_code = np.asarray(per_code)
+    return np.append(per_code, np.array([fill], dtype=per_code.dtype))[codes]
+
+
+def first_extreme_by_group(keys: pd.Series, values: pd.Series, dts: pd.Series, how: str = "min") -> pd.Series:
+    """
+    Por grupo (keys): valor de la fila con fecha mínima ("min") o máxima ("max"),
+    considerando solo filas con fecha válida. En empate gana la primera aparición.
+    Una sola agregación agrupada (idxmin/idxmax) en vez de un loop por grupo.
+    """
+    valid = dts.notna().to_numpy()
+    frame = pd.DataFrame({
+        "key": keys.to_numpy()[valid],
+        "dt": dts.to_numpy()[valid],
+        "val": values.to_numpy()[valid],
+    })
+    if frame.empty:
+        return pd.Series(dtype=object)
+
+    grouped = frame.groupby("key", sort=False)["dt"]
+    pos = grouped.idxmin() if how == "min" else grouped.idxmax()
+    return pd.Series(frame["val"].to_numpy()[pos.to_numpy()], index=pos.index, dtype=object)
+
+
+def resolve_bol_n(keys, h_min: pd.Series, h_first: pd.Series, g_min: pd.Series, g_first: pd.Series) -> pd.Series:
+    """
+    N de cada BOL desde sus contenedores (series indexadas por BOL):
+    H mínima; si hay H pero ninguna parsea, la primera H.
+    Si no hay H, lo mismo con G; si no hay nada => "No Valido".
+    """
+    bol_n = (
+        h_min.reindex(keys)
+        .fillna(h_first.reindex(keys))
+        .fillna(g_min.reindex(keys))
+        .fillna(g_first.reindex(keys))
+        .fillna("No Valido")
+    )
+    return bol_n
+
+
+def compute_valor_priorizado(df: pd.DataFrame, copy: bool = True) -> pd.DataFrame:
     """
     Columna N (Valor priorizado) BASE (por fila):
     - Si H tiene valor -> N = H
     - Si no, si G tiene valor -> N = G
     - Si no -> "No Valido"
     """
-    df = df.copy()
-    g = df.iloc[:, IDX_G_ESTIMATED]
-    h = df.iloc[:, IDX_H_ACTUAL]
+    if copy:
+        df = df.copy()
+    g = clean_text_values(df.iloc[:, IDX_G_ESTIMATED])
+    h = clean_text_values(df.iloc[:, IDX_H_ACTUAL])
 
-    out = []
-    for hv, gv in zip(h.tolist(), g.tolist()):
-        if not is_blank(hv):
-            out.append(str(hv).strip())
-        elif not is_blank(gv):
-            out.append(str(gv).strip())
-        else:
-            out.append("No Valido")
-
-    df.iloc[:, IDX_N_PRIORITIZED] = out
+    out = h.fillna(g).fillna("No Valido")
+    df.isetitem(IDX_N_PRIORITIZED, out.to_numpy(dtype=object))
     return df
 
 
-def fill_n_for_bol_from_containers(df: pd.DataFrame, date_mode: str) -> pd.DataFrame:
+def fill_n_for_bol_from_containers(
+    df: pd.DataFrame,
+    date_mode: str,
+    dates: DateStore = None,
+    bol_to_n: dict = None,
+    copy: bool = True,
+    rows: RowIndex = None,
+) -> pd.DataFrame:
     """
     Para filas BILL_OF_LADING:
     Si su propia fila NO tiene G NI H, entonces N se toma desde sus contenedores (mismo C):
       1) Si existe H (ATA) en contenedores => usar H mínima (más antigua)
       2) Si no, pero existe G (ETA) => usar G mínima (más antigua)
       3) Si no hay nada => "No Valido"
-    """
-    df = df.copy()
 
-    types_norm = df.iloc[:, IDX_B_SHIPMENT_TYPE].apply(normalize_type)
-    mask_container = types_norm.str.contains("CONTAINER", na=False) & ~types_norm.str.contains("BILL_OF_LADING", na=False)
-    mask_bol = types_norm.str.contains("BILL_OF_LADING", na=False)
+    `bol_to_n` permite pasar el mapa ya calculado (ej: modo streaming, donde los
+    contenedores de un BOL pueden estar en otro bloque del archivo).
+    """
+    if copy:
+        df = df.copy()
+    if rows is None:
+        rows = RowIndex(df)
 
-    if mask_bol.sum() == 0 or mask_container.sum() == 0:
+    if not rows.mask_bol.any():
         return df
+    if bol_to_n is None:
+        if not rows.mask_container.any():
+            return df
+        if dates is None:
+            dates = DateStore.from_frame(df, date_mode)
+        bol_to_n = compute_bol_n_map_from_containers(df, rows, dates)
 
-    def clean_date_str(v):
-        if is_blank(v):
-            return None
-        nv = normalize_text_for_compare(v)
-        if nv == "no valido" or nv.startswith("no valido"):
-            return None
-        return str(v).strip()
-
-    cont_keys = df.loc[mask_container].iloc[:, IDX_C_BOL].apply(clean_bol_key)
-    cont_h = df.loc[mask_container].iloc[:, IDX_H_ACTUAL].apply(clean_date_str)
-    cont_g = df.loc[mask_container].iloc[:, IDX_G_ESTIMATED].apply(clean_date_str)
-
-    dayfirst = None
-    if date_mode == "AUTO":
-        combined = pd.concat([cont_h, cont_g], ignore_index=True)
-        dt_mdy = pd.to_datetime(combined, errors="coerce", dayfirst=False)
-        dt_dmy = pd.to_datetime(combined, errors="coerce", dayfirst=True)
-        dayfirst = dt_dmy.notna().sum() > dt_mdy.notna().sum()
-
-    cont_h_dt = parse_dates(cont_h, mode=date_mode, dayfirst=dayfirst)
-    cont_g_dt = parse_dates(cont_g, mode=date_mode, dayfirst=dayfirst)
-
-    sub = pd.DataFrame({"bol": cont_keys, "h": cont_h, "g": cont_g, "h_dt": cont_h_dt, "g_dt": cont_g_dt})
-    sub = sub[sub["bol"] != ""]
-
-    bol_to_n = {}
-    for bol_id, grp in sub.groupby("bol", sort=False):
-        # Preferir H si existe
-        if grp["h"].notna().any():
-            valid_h = grp[grp["h_dt"].notna()]
-            if not valid_h.empty:
-                min_dt = valid_h["h_dt"].min()
-                bol_to_n[bol_id] = valid_h.loc[valid_h["h_dt"] == min_dt, "h"].iloc[0]
-            else:
-                bol_to_n[bol_id] = grp.loc[grp["h"].notna(), "h"].iloc[0]
-            continue
-
-        # Si no hay H, usar G
-        if grp["g"].notna().any():
-            valid_g = grp[grp["g_dt"].notna()]
-            if not valid_g.empty:
-                min_dt = valid_g["g_dt"].min()
-                bol_to_n[bol_id] = valid_g.loc[valid_g["g_dt"] == min_dt, "g"].iloc[0]
-            else:
-                bol_to_n[bol_id] = grp.loc[grp["g"].notna(), "g"].iloc[0]
-            continue
-
-        bol_to_n[bol_id] = "No Valido"
+    bol_g = df.iloc[:, IDX_G_ESTIMATED]
+    bol_h = df.iloc[:, IDX_H_ACTUAL]
 
-    bol_keys = df.loc[mask_bol].iloc[:, IDX_C_BOL].apply(clean_bol_key)
-    bol_g = df.loc[mask_bol].iloc[:, IDX_G_ESTIMATED]
-    bol_h = df.loc[mask_bol].iloc[:, IDX_H_ACTUAL]
-
-    needs_container_n = bol_g.apply(is_blank) & bol_h.apply(is_blank)
+    needs_container_n = rows.mask_bol & blank_mask(bol_g) & blank_mask(bol_h)
 
     if needs_container_n.any():
-        n_col = df.columns[IDX_N_PRIORITIZED]
-        idx_to_update = df.loc[mask_bol].index[needs_container_n]
-        keys_to_update = bol_keys.loc[needs_container_n]
-        df.loc[idx_to_update, n_col] = keys_to_update.map(bol_to_n).fillna("No Valido").values
+        pos = np.flatnonzero(needs_container_n)
+        df.iloc[pos, IDX_N_PRIORITIZED] = rows.map_keys(bol_to_n)[pos]
 
     return df
 
 
-def min_max_from_row_g_h(g_val, h_val, date_mode: str) -> tuple[str, str]:
-    """Caso especial (archivo con 1 único C): K/L desde su propia fila usando G/H."""
-    def clean(v):
-        if is_blank(v):
-            return None
-        nv = normalize_text_for_compare(v)
-        if nv == "no valido" or nv.startswith("no valido"):
-            return None
-        return str(v).strip()
-
-    g_str = clean(g_val)
-    h_str = clean(h_val)
-
-    if g_str is None and h_str is None:
-        return "No Valido", "No Valido"
-    if g_str is not None and h_str is None:
-        return g_str, g_str
-    if g_str is None and h_str is not None:
-        return h_str, h_str
-
-    dt = parse_dates(pd.Series([g_str, h_str]), mode=date_mode)
-    g_dt, h_dt = dt.iloc[0], dt.iloc[1]
-
-    if pd.isna(g_dt) and pd.isna(h_dt):
-        return "No Valido", "No Valido"
-    if pd.isna(g_dt) and not pd.isna(h_dt):
-        return h_str, h_str
-    if not pd.isna(g_dt) and pd.isna(h_dt):
-        return g_str, g_str
-
-    if g_dt <= h_dt:
-        return g_str, h_str
-    return h_str, g_str
+def compute_bol_n_map_from_containers(df: pd.DataFrame, rows: RowIndex, dates: DateStore) -> dict:
+    """BOL -> N desde sus contenedores (ver fill_n_for_bol_from_containers)."""
+    cont = np.flatnonzero(rows.mask_container & (rows.bol_codes >= 0))
+    codes = pd.Series(rows.bol_codes[cont])
+    cont_h = clean_date_values(df.iloc[cont, IDX_H_ACTUAL]).reset_index(drop=True)
+    cont_g = clean_date_values(df.iloc[cont, IDX_G_ESTIMATED]).reset_index(drop=True)
+
+    cont_h_dt = dates.to_datetime(cont_h)
+    cont_g_dt = dates.to_datetime(cont_g)
+
+    grouped_h = cont_h.groupby(codes, sort=False)
+    grouped_g = cont_g.groupby(codes, sort=False)
+    bol_n = resolve_bol_n(
+        pd.unique(codes),
+        h_min=first_extreme_by_group(codes, cont_h, cont_h_dt, "min"),
+        h_first=grouped_h.first(),
+        g_min=first_extreme_by_group(codes, cont_g, cont_g_dt, "min"),
+        g_first=grouped_g.first(),
+    )
+    return rows.by_key(bol_n)
 
 
-def compute_min_max_maps_from_containers(df: pd.DataFrame, date_mode: str):
+def min_max_from_g_h(g: pd.Series, h: pd.Series, dates: DateStore) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Caso especial (archivo con 1 único C): K/L por fila desde su propia G/H.
+    - solo una de las dos (no en blanco ni "No Valido") => esa en K y L
+    - ambas: la menor fecha en K y la mayor en L (si una no parsea, la otra en K y L)
+    - ninguna, o ninguna parsea => "No Valido" en K y L
+    """
+    g_str = clean_date_values(g).to_numpy(dtype=object)
+    h_str = clean_date_values(h).to_numpy(dtype=object)
+    g_dt = dates.to_datetime(pd.Series(g_str, dtype=object))
+    h_dt = dates.to_datetime(pd.Series(h_str, dtype=object))
+
+    has_g = pd.notna(g_str)
+    has_h = pd.notna(h_str)
+    both = has_g & has_h
+    g_ok = g_dt.notna().to_numpy()
+    h_ok = h_dt.notna().to_numpy()
+    ordered = both & g_ok & h_ok
+    g_le_h = ordered & (g_dt <= h_dt).to_numpy()
+
+    only_g = (has_g & ~has_h) | (both & g_ok & ~h_ok)
+    only_h = (has_h & ~has_g) | (both & h_ok & ~g_ok)
+    k = np.full(len(g_str), "No Valido", dtype=object)
+    l = np.full(len(g_str), "No Valido", dtype=object)
+    k[only_g] = l[only_g] = g_str[only_g]
+    k[only_h] = l[only_h] = h_str[only_h]
+    k[g_le_h], l[g_le_h] = g_str[g_le_h], h_str[g_le_h]
+    h_le_g = ordered & ~g_le_h
+    k[h_le_g], l[h_le_g] = h_str[h_le_g], g_str[h_le_g]
+    return k, l
+
+
+def compute_min_max_maps_from_containers(
+    df: pd.DataFrame, date_mode: str, dates: DateStore = None, rows: RowIndex = None
+):
     """
     ✅ CORRECCIÓN CLAVE:
     Calcula bol->min y bol->max usando SOLO CONTENEDORES (mismo C),
@@ -279,86 +663,55 @@ def compute_min_max_maps_from_containers(df: pd.DataFrame, date_mode: str):
     Si un BOL tiene contenedores con mezcla (algunos "No Valido" y otros con fecha),
     se usa SOLO el subconjunto con fecha válida para obtener min/max.
     """
-    types_norm = df.iloc[:, IDX_B_SHIPMENT_TYPE].apply(normalize_type)
-    mask_container = types_norm.str.contains("CONTAINER", na=False) & ~types_norm.str.contains("BILL_OF_LADING", na=False)
+    if dates is None:
+        dates = DateStore.from_frame(df, date_mode)
+    if rows is None:
+        rows = RowIndex(df)
 
-    if mask_container.sum() == 0:
+    if not rows.mask_container.any():
         return {}, {}
 
-    bol = df.loc[mask_container].iloc[:, IDX_C_BOL].apply(clean_bol_key)
-    n_raw = df.loc[mask_container].iloc[:, IDX_N_PRIORITIZED]
-
-    def clean_n(v):
-        if is_blank(v):
-            return None
-        nv = normalize_text_for_compare(v)
-        if nv == "no valido" or nv.startswith("no valido"):
-            return None
-        return str(v).strip()
-
-    n_clean = n_raw.apply(clean_n)
-
-    sub = pd.DataFrame({"bol": bol, "n": n_clean})
-    sub = sub[sub["bol"] != ""]
+    cont = np.flatnonzero(rows.mask_container & (rows.bol_codes >= 0))
+    codes = pd.Series(rows.bol_codes[cont])
+    n_clean = clean_date_values(df.iloc[cont, IDX_N_PRIORITIZED]).reset_index(drop=True)
+    n_dt = dates.to_datetime(n_clean)
 
-    min_map = {}
-    max_map = {}
-
-    # Parse por grupo (más robusto en AUTO)
-    for bol_id, grp in sub.groupby("bol", sort=False):
-        vals = grp["n"].dropna()
-        if vals.empty:
-            min_map[bol_id] = "No Valido"
-            max_map[bol_id] = "No Valido"
-            continue
-
-        if date_mode == "AUTO":
-            dt_mdy = pd.to_datetime(vals, errors="coerce", dayfirst=False)
-            dt_dmy = pd.to_datetime(vals, errors="coerce", dayfirst=True)
-            dt = dt_dmy if dt_dmy.notna().sum() > dt_mdy.notna().sum() else dt_mdy
-        elif date_mode == "MDY":
-            dt = pd.to_datetime(vals, errors="coerce", dayfirst=False)
-        else:  # DMY
-            dt = pd.to_datetime(vals, errors="coerce", dayfirst=True)
-
-        valid = pd.DataFrame({"n": vals, "dt": dt})
-        valid = valid[valid["dt"].notna()]
-
-        if valid.empty:
-            # no hay fechas parseables (aunque haya strings); no inventamos valores
-            min_map[bol_id] = "No Valido"
-            max_map[bol_id] = "No Valido"
-            continue
+    # BOL sin fechas parseables (aunque haya strings) => "No Valido"; no inventamos valores
+    keys = pd.unique(codes)
+    min_map = first_extreme_by_group(codes, n_clean, n_dt, "min").reindex(keys).fillna("No Valido")
+    max_map = first_extreme_by_group(codes, n_clean, n_dt, "max").reindex(keys).fillna("No Valido")
 
-        min_dt = valid["dt"].min()
-        max_dt = valid["dt"].max()
+    return rows.by_key(min_map), rows.by_key(max_map)
 
-        min_map[bol_id] = valid.loc[valid["dt"] == min_dt, "n"].iloc[0]
-        max_map[bol_id] = valid.loc[valid["dt"] == max_dt, "n"].iloc[0]
 
-    return min_map, max_map
-
-
-def fill_k_l_for_container_rows(df: pd.DataFrame, min_map: dict, max_map: dict) -> pd.DataFrame:
+def fill_k_l_for_container_rows(
+    df: pd.DataFrame, min_map: dict, max_map: dict, copy: bool = True, rows: RowIndex = None
+) -> pd.DataFrame:
     """Rellena K/L SOLO en filas contenedor usando col C como llave."""
-    df = df.copy()
-    types_norm = df.iloc[:, IDX_B_SHIPMENT_TYPE].apply(normalize_type)
-    mask_container = types_norm.str.contains("CONTAINER", na=False) & ~types_norm.str.contains("BILL_OF_LADING", na=False)
+    if copy:
+        df = df.copy()
+    if rows is None:
+        rows = RowIndex(df)
 
-    if mask_container.sum() == 0:
+    if not rows.mask_container.any():
         return df
 
-    bol_keys = df.loc[mask_container].iloc[:, IDX_C_BOL].apply(clean_bol_key)
-
-    colK = df.columns[IDX_K_MIN]
-    colL = df.columns[IDX_L_MAX]
-
-    df.loc[mask_container, colK] = bol_keys.map(min_map).fillna("No Valido")
-    df.loc[mask_container, colL] = bol_keys.map(max_map).fillna("No Valido")
+    pos = np.flatnonzero(rows.mask_container)
+    df.iloc[pos, IDX_K_MIN] = rows.map_keys(min_map)[pos]
+    df.iloc[pos, IDX_L_MAX] = rows.map_keys(max_map)[pos]
     return df
 
 
-def fill_k_l_for_bol_rows_from_containers(df: pd.DataFrame, min_map: dict, max_map: dict, date_mode: str) -> pd.DataFrame:
+def fill_k_l_for_bol_rows_from_containers(
+    df: pd.DataFrame,
+    min_map: dict,
+    max_map: dict,
+    date_mode: str,
+    dates: DateStore = None,
+    single_key: bool = None,
+    copy: bool = True,
+    rows: RowIndex = None,
+) -> pd.DataFrame:
     """
     K/L para filas BILL_OF_LADING:
 
@@ -367,87 +720,112 @@ def fill_k_l_for_bol_rows_from_containers(df: pd.DataFrame, min_map: dict, max_m
         Si G/H no válidos, fallback a contenedores.
     - Si el archivo tiene MÁS de 1 valor en C:
         K/L SIEMPRE desde contenedores (min_map/max_map), ignorando "No Valido" gracias al cálculo de mapas.
+
+    `single_key` permite fijar el caso "1 único C" desde afuera (ej: modo streaming).
     """
-    df = df.copy()
-    types_norm = df.iloc[:, IDX_B_SHIPMENT_TYPE].apply(normalize_type)
-    mask_bol = types_norm.str.contains("BILL_OF_LADING", na=False)
+    if copy:
+        df = df.copy()
+    if rows is None:
+        rows = RowIndex(df)
 
-    if mask_bol.sum() == 0:
+    if not rows.mask_bol.any():
         return df
 
-    colK = df.columns[IDX_K_MIN]
-    colL = df.columns[IDX_L_MAX]
+    if single_key is None:
+        single_key = rows.single_key
 
-    all_keys = df.iloc[:, IDX_C_BOL].apply(clean_bol_key)
-    unique_nonblank_c = pd.unique(all_keys[all_keys != ""])
-    only_one_unique_in_file = len(unique_nonblank_c) == 1
+    pos = np.flatnonzero(rows.mask_bol)
+    k_from_containers = rows.map_keys(min_map)[pos]
+    l_from_containers = rows.map_keys(max_map)[pos]
 
-    if only_one_unique_in_file:
-        bol_indexes = df.loc[mask_bol].index.tolist()
-        k_values = []
-        l_values = []
+    if single_key:
+        if dates is None:
+            dates = DateStore.from_frame(df, date_mode)
+        k_values, l_values = min_max_from_g_h(df.iloc[pos, IDX_G_ESTIMATED], df.iloc[pos, IDX_H_ACTUAL], dates)
 
-        for idx in bol_indexes:
-            g_val = df.at[idx, df.columns[IDX_G_ESTIMATED]]
-            h_val = df.at[idx, df.columns[IDX_H_ACTUAL]]
-            mn, mx = min_max_from_row_g_h(g_val, h_val, date_mode=date_mode)
-
-            if mn == "No Valido" and mx == "No Valido":
-                key = clean_bol_key(df.at[idx, df.columns[IDX_C_BOL]])
-                mn = min_map.get(key, "No Valido")
-                mx = max_map.get(key, "No Valido")
-
-            k_values.append(mn)
-            l_values.append(mx)
-
-        df.loc[mask_bol, colK] = pd.Series(k_values, index=bol_indexes).fillna("No Valido")
-        df.loc[mask_bol, colL] = pd.Series(l_values, index=bol_indexes).fillna("No Valido")
+        # G/H no válidos en la fila => fallback a contenedores
+        from_containers = (k_values == "No Valido") & (l_values == "No Valido")
+        df.iloc[pos, IDX_K_MIN] = np.where(from_containers, k_from_containers, k_values)
+        df.iloc[pos, IDX_L_MAX] = np.where(from_containers, l_from_containers, l_values)
         return df
 
-    bol_keys = all_keys[mask_bol]
-    df.loc[mask_bol, colK] = bol_keys.map(min_map).fillna("No Valido")
-    df.loc[mask_bol, colL] = bol_keys.map(max_map).fillna("No Valido")
+    df.iloc[pos, IDX_K_MIN] = k_from_containers
+    df.iloc[pos, IDX_L_MAX] = l_from_containers
     return df
 
 
-def fill_hours_diff_in_j(df: pd.DataFrame, date_mode: str) -> pd.DataFrame:
+def fill_hours_diff_in_j(df: pd.DataFrame, date_mode: str, dates: DateStore = None, copy: bool = True) -> pd.DataFrame:
     """
     Columna J (DIFERENCIA):
     - Diferencia en horas entre L y K: (L - K) en horas
     - Si K/L no es fecha válida o es "No Valido" => J = "No Valido"
+
+    Dentro del pipeline J queda numérica (float64, NaN = "No Valido");
+    el texto se arma solo al exportar (ver to_display_frame).
     """
-    df = df.copy()
+    if copy:
+        df = df.copy()
+    if dates is None:
+        dates = DateStore.from_frame(df, date_mode)
 
-    k_raw = df.iloc[:, IDX_K_MIN]
-    l_raw = df.iloc[:, IDX_L_MAX]
+    k_clean = clean_date_values(df.iloc[:, IDX_K_MIN])
+    l_clean = clean_date_values(df.iloc[:, IDX_L_MAX])
 
-    k_clean = k_raw.apply(lambda v: None if (is_blank(v) or normalize_text_for_compare(v) in ["no valido"] or normalize_text_for_compare(v).startswith("no valido")) else str(v).strip())
-    l_clean = l_raw.apply(lambda v: None if (is_blank(v) or normalize_text_for_compare(v) in ["no valido"] or normalize_text_for_compare(v).startswith("no valido")) else str(v).strip())
+    k_dt = dates.to_datetime(k_clean)
+    l_dt = dates.to_datetime(l_clean)
 
-    dayfirst = None
-    if date_mode == "AUTO":
-        combined = pd.concat([k_clean, l_clean], ignore_index=True)
-        dt_mdy = pd.to_datetime(combined, errors="coerce", dayfirst=False)
-        dt_dmy = pd.to_datetime(combined, errors="coerce", dayfirst=True)
-        dayfirst = dt_dmy.notna().sum() > dt_mdy.notna().sum()
+    diff_hours = (l_dt - k_dt) / pd.Timedelta(hours=1)
 
-    k_dt = parse_dates(k_clean, mode=date_mode, dayfirst=dayfirst)
-    l_dt = parse_dates(l_clean, mode=date_mode, dayfirst=dayfirst)
+    df.isetitem(IDX_J_DIFF_HOURS, diff_hours.to_numpy(dtype=np.float64))
+    return df
 
-    diff_hours = (l_dt - k_dt) / pd.Timedelta(hours=1)
 
-    def fmt_hours(x):
-        if pd.isna(x):
-            return "No Valido"
-        if abs(float(x) - round(float(x))) < 1e-9:
-            return str(int(round(float(x))))
-        return f"{float(x):.2f}"
+def format_hours(x) -> str:
+    """Texto de J: entero si no tiene decimales, si no 2 decimales; NaN => "No Valido"."""
+    if pd.isna(x):
+        return "No Valido"
+    if abs(float(x) - round(float(x))) < 1e-9:
+        return str(int(round(float(x))))
+    return f"{float(x):.2f}"
 
-    df.iloc[:, IDX_J_DIFF_HOURS] = diff_hours.apply(fmt_hours)
-    return df
 
+def format_hours_array(hours: np.ndarray) -> np.ndarray:
+    """format_hours vectorizado: los enteros se convierten en bloque, el resto valor a valor."""
+    hours = np.asarray(hours, dtype=np.float64)
+    out = np.full(len(hours), "No Valido", dtype=object)
+    valid = ~np.isnan(hours)
+    rounded = np.round(hours)
+    is_int = valid & (np.abs(hours - rounded) < 1e-9)
+    out[is_int] = rounded[is_int].astype(np.int64).astype(str)
+    other = valid & ~is_int
+    out[other] = [f"{v:.2f}" for v in hours[other]]
+    return out
 
-def fill_range_in_o(df: pd.DataFrame) -> pd.DataFrame:
+
+def hours_from_text(j: pd.Series) -> np.ndarray:
+    """J en texto (ej: archivo ya procesado) -> horas; blanco/"No Valido"/no numérico => NaN."""
+    text = j.astype(object).where(j.notna(), "").astype(str).str.strip().str.replace(",", ".", regex=False)
+    return pd.to_numeric(text.where(text != ""), errors="coerce").to_numpy(dtype=np.float64)
+
+
+def bucket_hours(hours: np.ndarray) -> np.ndarray:
+    """
+    RANGO DIFERENCIA para un arreglo de horas:
+      0 => "0", 0 < h <= 24 => "0 - 24 Hrs", h > 24 => "+ de 24 Hrs", NaN o negativo => "No Valido".
+    Se evalúa sobre J tal como se exporta (redondeado a 2 decimales): los valores cerca
+    de 0 y de 24 usan el mismo formateo que la exportación.
+    """
+    h = np.array(hours, dtype=np.float64)
+    near = ~np.isnan(h) & ((np.abs(h) < 0.01) | (np.abs(h - 24) < 0.01))
+    h[near] = [float(format_hours(v)) for v in h[near]]
+    return np.select(
+        [np.isnan(h) | (h < 0), np.abs(h) < 1e-9, h <= 24],
+        ["No Valido", "0", "0 - 24 Hrs"],
+        default="+ de 24 Hrs",
+    ).astype(object)
+
+
+def fill_range_in_o(df: pd.DataFrame, copy: bool = True) -> pd.DataFrame:
     """
     Columna O (RANGO DIFERENCIA) usando J (DIFERENCIA en horas):
       - J == 0            => "0"
@@ -455,33 +833,128 @@ def fill_range_in_o(df: pd.DataFrame) -> pd.DataFrame:
       - J > 24            => "+ de 24 Hrs"
       - inválido/No Valido => "No Valido"
     """
-    df = df.copy()
-    j_raw = df.iloc[:, IDX_J_DIFF_HOURS]
+    if copy:
+        df = df.copy()
+    j = df.iloc[:, IDX_J_DIFF_HOURS]
+    hours = j.to_numpy(dtype=np.float64) if pd.api.types.is_numeric_dtype(j) else hours_from_text(j)
 
-    def parse_hours(v):
-        if is_blank(v) or normalize_text_for_compare(v) == "no valido" or normalize_text_for_compare(v).startswith("no valido"):
-            return None
-        s = str(v).strip().replace(",", ".")
-        try:
-            return float(s)
-        except Exception:
-            return None
-
-    def bucket(v):
-        h = parse_hours(v)
-        if h is None or h < 0:
-            return "No Valido"
-        if abs(h) < 1e-9:
-            return "0"
-        if h <= 24:
-            return "0 - 24 Hrs"
-        return "+ de 24 Hrs"
-
-    df.iloc[:, IDX_O_RANGE] = j_raw.apply(bucket)
+    df.isetitem(IDX_O_RANGE, bucket_hours(hours))
     return df
 
 
-def build_summary_counts(df_out: pd.DataFrame) -> pd.DataFrame:
+SUMMARY_INDICATORS = [
+    "BL únicos",
+    "BL válidos",
+    "BLs con diferencia 0",
+    "BLs con diferencia 0 - 24 Hrs",
+    "BLs con diferencia + de 24 Hrs",
+]
+
+
+def summary_flags(df_out: pd.DataFrame, rows: RowIndex = None) -> pd.DataFrame:
+    """
+    Por cada fila que cuenta en la Tabla Resumen (BILL_OF_LADING, primera aparición de
+    cada BL = col A no vacía): un booleano por indicador. El índice es la posición de la fila.
+    """
+    if rows is None:
+        rows = RowIndex(df_out)
+    pos = np.flatnonzero(rows.mask_bol)
+
+    bl_id = clean_text_values(df_out.iloc[pos, IDX_A_SHIPMENT_ID])
+    first = bl_id.notna().to_numpy() & ~bl_id.duplicated(keep="first").to_numpy()
+    pos = pos[first]
+
+    valid = ~TextValues(df_out.iloc[pos, IDX_N_PRIORITIZED]).invalid_mask()
+    o_val = clean_text_values(df_out.iloc[pos, IDX_O_RANGE]).to_numpy(dtype=object)
+    return pd.DataFrame(
+        {
+            "BL únicos": np.ones(len(pos), dtype=bool),
+            "BL válidos": valid,
+            "BLs con diferencia 0": o_val == "0",
+            "BLs con diferencia 0 - 24 Hrs": o_val == "0 - 24 Hrs",
+            "BLs con diferencia + de 24 Hrs": o_val == "+ de 24 Hrs",
+        },
+        index=pos,
+    )
+
+
+def summary_month_of_n(df_out: pd.DataFrame, pos: np.ndarray, rows: RowIndex, dates: "DateStore") -> np.ndarray:
+    """Mes de N ("AAAA-MM"); "No Valido" si N no es una fecha. Cada mes distinto se formatea una vez."""
+    n = dates.to_datetime(clean_date_values(df_out.iloc[pos, IDX_N_PRIORITIZED]))
+    codes, months = pd.factorize(n.dt.to_period("M"))
+    return take_codes(months.astype(str).to_numpy(dtype=object), codes, fill="No Valido")
+
+
+def summary_carrier(df_out: pd.DataFrame, pos: np.ndarray, rows: RowIndex, dates: "DateStore") -> np.ndarray:
+    """Transportista: primeros CARRIER_PREFIX_CHARS caracteres de la clave BOL (col C, código SCAC)."""
+    per_key = pd.Series(rows.bol_keys, dtype=object).str[:CARRIER_PREFIX_CHARS].to_numpy(dtype=object)
+    return take_codes(per_key, rows.bol_codes[pos], fill="")
+
+
+def summary_shipment_type(df_out: pd.DataFrame, pos: np.ndarray, rows: RowIndex, dates: "DateStore") -> np.ndarray:
+    """Shipment type (col B normalizada)."""
+    return np.asarray(rows.shipment_type[pos], dtype=object)
+
+
+CARRIER_PREFIX_CHARS = 4
+# Dimensiones del cubo de la Tabla Resumen: nombre -> valor por fila contada (summary_flags)
+SUMMARY_DIMENSIONS = {
+    "Mes de N": summary_month_of_n,
+    "Transportista (prefijo C)": summary_carrier,
+    "Shipment type": summary_shipment_type,
+}
+
+
+def build_summary_cube(
+    df_out: pd.DataFrame,
+    dimensions: list = (),
+    rows: RowIndex = None,
+    dates: "DateStore" = None,
+    date_mode: str = "AUTO",
+    dayfirst: bool = None,
+) -> pd.DataFrame:
+    """
+    Cubo de la Tabla Resumen: un solo groupby de las filas que cuentan (summary_flags,
+    BL únicos por col A) por `dimensions` (nombres de SUMMARY_DIMENSIONS).
+    Índice: una combinación de dimensiones por fila; columnas: SUMMARY_INDICATORS.
+    Sin dimensiones, una fila con los totales.
+    Las fechas de N se leen con `dates` o, si falta, con un DateStore de `date_mode` que
+    parsea solo esas N; en AUTO conviene pasar el `dayfirst` que usó el pipeline
+    (PipelineProfile.dayfirst): sin él se decide con las mismas N.
+    """
+    if rows is None:
+        rows = RowIndex(df_out)
+    flags = summary_flags(df_out, rows=rows)
+    if not dimensions:
+        return flags.sum().to_frame().T.astype(np.int64)
+
+    if dates is None:
+        dates = DateStore(date_mode, dayfirst=dayfirst)
+    pos = flags.index.to_numpy()
+    keys = [pd.Series(SUMMARY_DIMENSIONS[name](df_out, pos, rows, dates), index=flags.index, name=name) for name in dimensions]
+    return flags.groupby(keys, sort=True).sum().astype(np.int64)
+
+
+def slice_summary_cube(cube: pd.DataFrame, by: list = (), where: dict = None) -> pd.DataFrame:
+    """
+    Corte del cubo sin volver a leer los datos: filtra por `where` ({dimensión: valor o
+    lista de valores}) y suma por las dimensiones `by`; sin `by`, una fila con los totales.
+    """
+    for name, values in (where or {}).items():
+        values = values if isinstance(values, (list, tuple, set)) else [values]
+        cube = cube[cube.index.get_level_values(name).isin(values)]
+    if by:
+        return cube.groupby(level=list(by), sort=True).sum()
+    return cube.sum().to_frame().T.astype(np.int64)
+
+
+def summary_from_cube(cube: pd.DataFrame, where: dict = None) -> pd.DataFrame:
+    """Tabla Resumen (indicador, valor) de un corte del cubo (`where`, ver slice_summary_cube)."""
+    totals = slice_summary_cube(cube, where=where).iloc[0]
+    return pd.DataFrame([{"indicador": name, "valor": int(totals[name])} for name in SUMMARY_INDICATORS])
+
+
+def build_summary_counts(df_out: pd.DataFrame, rows: RowIndex = None) -> pd.DataFrame:
     """
     Tabla Resumen (solo filas BILL_OF_LADING, contadas por BL único = col A):
     - BL únicos
@@ -489,116 +962,1174 @@ def build_summary_counts(df_out: pd.DataFrame) -> pd.DataFrame:
     - BLs con diferencia 0
     - BLs con diferencia 0 - 24 Hrs
     - BLs con diferencia + de 24 Hrs
+    Son los totales del cubo sin dimensiones (ver build_summary_cube).
     """
-    types_norm = df_out.iloc[:, IDX_B_SHIPMENT_TYPE].apply(normalize_type)
-    mask_bol = types_norm.str.contains("BILL_OF_LADING", na=False)
+    return summary_from_cube(build_summary_cube(df_out, rows=rows))
 
-    if mask_bol.sum() == 0:
-        return pd.DataFrame([
-            {"indicador": "BL únicos", "valor": 0},
-            {"indicador": "BL válidos", "valor": 0},
-            {"indicador": "BLs con diferencia 0", "valor": 0},
-            {"indicador": "BLs con diferencia 0 - 24 Hrs", "valor": 0},
-            {"indicador": "BLs con diferencia + de 24 Hrs", "valor": 0},
-        ])
 
-    bol_df = df_out.loc[mask_bol].copy()
+RANGE_BUCKETS = ["0", "0 - 24 Hrs", "+ de 24 Hrs", "No Valido"]  # valores de O (bucket_hours)
+RESULTS_PAGE_ROWS = 100  # filas por página del explorador de la app
 
-    bol_df["_bl_id"] = bol_df.iloc[:, IDX_A_SHIPMENT_ID].apply(lambda v: None if is_blank(v) else str(v).strip())
-    bol_df = bol_df[bol_df["_bl_id"].notna()]
-    bol_df = bol_df.drop_duplicates(subset=["_bl_id"], keep="first")
 
-    bl_unicos = int(bol_df["_bl_id"].nunique())
-
-    n_norm = bol_df.iloc[:, IDX_N_PRIORITIZED].apply(normalize_text_for_compare)
-    bl_validos = int(((n_norm != "") & ~(n_norm == "no valido") & ~n_norm.str.startswith("no valido")).sum())
+def filter_rows(
+    df_out: pd.DataFrame,
+    rows: RowIndex,
+    types: list = None,
+    ranges: list = None,
+    bol: str = "",
+    only_no_valido: bool = False,
+) -> np.ndarray:
+    """
+    Posiciones de las filas del Archivo completo que pasan los filtros del explorador:
+    - types: Shipment type (col B normalizada, normalize_type)
+    - ranges: RANGO DIFERENCIA (col O)
+    - bol: texto contenido en la clave BOL (col C limpia), sin distinguir mayúsculas
+    - only_no_valido: alguna de N/K/L/O es "No Valido"
+    Los filtros vacíos no filtran. Cada valor distinto se evalúa una sola vez.
+    """
+    mask = np.ones(len(df_out), dtype=bool)
+    if types:
+        wanted = pd.Index(rows.shipment_type.categories).isin(types)
+        mask &= take_codes(wanted, rows.shipment_type.codes, fill=False)
+    if ranges:
+        mask &= clean_text_values(df_out.iloc[:, IDX_O_RANGE]).isin(ranges).to_numpy()
+    if bol.strip():
+        per_key = pd.Series(rows.bol_keys, dtype=object).str.contains(bol.strip(), case=False, regex=False)
+        mask &= take_codes(per_key.to_numpy(dtype=bool), rows.bol_codes, fill=False)
+    if only_no_valido:
+        no_valido = np.zeros(len(df_out), dtype=bool)
+        for idx in (IDX_K_MIN, IDX_L_MAX, IDX_N_PRIORITIZED, IDX_O_RANGE):
+            no_valido |= TextValues(df_out.iloc[:, idx]).no_valido_mask()
+        mask &= no_valido
+    return np.flatnonzero(mask)
+
+
+def to_display_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Frame para mostrar/exportar: J numérica pasa a texto ("12", "12.50", "No Valido")."""
+    if df.shape[1] < MIN_COLS_A_TO_O or not pd.api.types.is_numeric_dtype(df.iloc[:, IDX_J_DIFF_HOURS]):
+        return df
+    df = df.copy(deep=False)
+    df.isetitem(IDX_J_DIFF_HOURS, format_hours_array(df.iloc[:, IDX_J_DIFF_HOURS].to_numpy()))
+    return df
 
-    o_val = bol_df.iloc[:, IDX_O_RANGE].apply(lambda v: "" if is_blank(v) else str(v).strip())
-    diff_0 = int((o_val == "0").sum())
-    diff_0_24 = int((o_val == "0 - 24 Hrs").sum())
-    diff_gt_24 = int((o_val == "+ de 24 Hrs").sum())
 
-    return pd.DataFrame([
-        {"indicador": "BL únicos", "valor": bl_unicos},
-        {"indicador": "BL válidos", "valor": bl_validos},
-        {"indicador": "BLs con diferencia 0", "valor": diff_0},
-        {"indicador": "BLs con diferencia 0 - 24 Hrs", "valor": diff_0_24},
-        {"indicador": "BLs con diferencia + de 24 Hrs", "valor": diff_gt_24},
-    ])
+def write_csv(df: pd.DataFrame, out, sep: str, include_header: bool, chunk_rows: int = CSV_CHUNK_ROWS) -> None:
+    """Escribe el CSV (utf-8 con BOM) en `out` (binario) por bloques de filas: nunca arma el texto completo."""
+    out.write("\ufeff".encode("utf-8"))
+    for start in range(0, max(len(df), 1), chunk_rows):
+        # En object to_csv escribe ~2x más rápido que desde categóricas / str de Arrow
+        chunk = to_display_frame(df.iloc[start:start + chunk_rows]).astype(object)
+        out.write(chunk.to_csv(index=False, sep=sep, header=include_header and start == 0).encode("utf-8"))
 
 
 def to_csv_bytes(df: pd.DataFrame, sep: str, include_header: bool) -> bytes:
-    return df.to_csv(index=False, sep=sep, header=include_header).encode("utf-8-sig")
+    buf = BytesIO()
+    write_csv(df, buf, sep=sep, include_header=include_header)
+    return buf.getvalue()
 
 
-# ---------------- Streamlit UI ----------------
-st.set_page_config(page_title="Reporte CSV", layout="wide")
-st.title("Reporte CSV: Tabla Resumen + Archivo completo")
+def to_export_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Frame para Parquet/Feather: mismo contenido que el CSV, nombres de columna como texto."""
+    df = to_display_frame(df).reset_index(drop=True)
+    if any(not isinstance(c, str) for c in df.columns):
+        df = df.set_axis([str(c) for c in df.columns], axis=1)
+    return df
 
-uploaded = st.file_uploader("Sube tu archivo CSV", type=["csv"])
-has_header = st.checkbox("Mi archivo tiene encabezados (header)", value=True)
 
-if uploaded:
-    raw_text = uploaded.getvalue().decode("utf-8-sig", errors="replace")
-    detected = sniff_delimiter(raw_text)
-    sep = st.selectbox("Delimitador", options=[detected, ",", ";", "\t", "|"], index=0)
+def to_parquet_bytes(df: pd.DataFrame) -> bytes:
+    buf = BytesIO()
+    to_export_frame(df).to_parquet(buf, index=False)
+    return buf.getvalue()
 
-    date_mode = st.selectbox(
-        "Formato de fecha para cálculos (N/K/L)",
-        options=["AUTO", "MDY", "DMY"],
-        index=0,
+
+def to_feather_bytes(df: pd.DataFrame) -> bytes:
+    buf = BytesIO()
+    to_export_frame(df).to_feather(buf)
+    return buf.getvalue()
+
+
+# Formato de descarga del Archivo completo -> (extensión, mime, función)
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv", None),
+    "Parquet": ("parquet", "application/vnd.apache.parquet", to_parquet_bytes),
+    "Feather": ("feather", "application/vnd.apache.arrow.file", to_feather_bytes),
+}
+
+# Compresión de la descarga -> (extensión agregada, mime)
+COMPRESSIONS = {
+    "Sin comprimir": (None, None),
+    "gzip": ("gz", "application/gzip"),
+    "zip": ("zip", "application/zip"),
+}
+
+
+@contextmanager
+def compressed_writer(buf, compression: str, entry_name: str):
+    """Destino binario sobre `buf`: directo, gzip o un zip con una sola entrada `entry_name`."""
+    ext = COMPRESSIONS[compression][0]
+    if ext is None:
+        yield buf
+    elif ext == "gz":
+        # mtime=0: el mismo resultado da los mismos bytes
+        with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=6, mtime=0) as out:
+            yield out
+    else:
+        with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+            with zf.open(entry_name, "w", force_zip64=True) as out:
+                yield out
+
+
+def export_file_name(name: str, export_format: str = "CSV", compression: str = "Sin comprimir") -> str:
+    """ "Archivo completo" -> "Archivo completo.csv", "Archivo completo.csv.gz", "Archivo completo.zip"..."""
+    file_name = f"{name}.{EXPORT_FORMATS[export_format][0]}"
+    ext = COMPRESSIONS[compression][0]
+    if ext == "zip":
+        return f"{name}.zip"
+    return f"{file_name}.{ext}" if ext else file_name
+
+
+def export_bytes(
+    df: pd.DataFrame,
+    sep: str,
+    include_header: bool,
+    export_format: str = "CSV",
+    compression: str = "Sin comprimir",
+    name: str = "Archivo completo",
+) -> bytes:
+    """Archivo completo en el formato y compresión elegidos (ver write_export)."""
+    buf = BytesIO()
+    write_export(df, buf, sep, include_header, export_format, compression, name=name)
+    return buf.getvalue()
+
+
+def write_export(
+    df: pd.DataFrame,
+    out,
+    sep: str,
+    include_header: bool,
+    export_format: str = "CSV",
+    compression: str = "Sin comprimir",
+    name: str = "Archivo completo",
+) -> None:
+    """Escribe el Archivo completo en `out` (binario: buffer o archivo). El CSV se escribe por bloques."""
+    export = EXPORT_FORMATS[export_format][2]
+    with compressed_writer(out, compression, export_file_name(name, export_format)) as target:
+        if export is None:
+            write_csv(df, target, sep=sep, include_header=include_header)
+        else:
+            target.write(export(df))
+
+
+def decode_csv_bytes(raw: bytes) -> str:
+    return raw.decode("utf-8-sig", errors="replace")
+
+
+def arrow_string_dtype():
+    """Dtype de texto respaldado por Arrow, con la misma semántica de NaN que lee pandas."""
+    if int(pd.__version__.split(".")[0]) < 3:
+        return pd.StringDtype("pyarrow")
+    return pd.StringDtype("pyarrow", na_value=np.nan)
+
+
+def read_csv_arrow(raw: bytes, sep: str, has_header: bool) -> pd.DataFrame:
+    """
+    Lee el CSV con pyarrow (multihilo) directo desde los bytes, todas las columnas como
+    texto string[pyarrow]. ValueError si pyarrow no está o no puede leer el archivo igual que
+    read_csv_text (UTF-8 inválido, filas con distinta cantidad de columnas, encabezados
+    vacíos o repetidos).
+    """
+    if pa is None:
+        raise ValueError("pyarrow no está instalado")
+
+    read_options = pa_csv.ReadOptions(autogenerate_column_names=not has_header)
+    parse_options = pa_csv.ParseOptions(delimiter=sep)
+    # Primera pasada solo para los nombres: el tipo de cada columna se fuerza a texto
+    names = pa_csv.open_csv(pa.BufferReader(raw), read_options=read_options, parse_options=parse_options).schema.names
+    if has_header and (len(set(names)) != len(names) or "" in names):
+        raise ValueError("encabezados vacíos o repetidos")
+
+    convert_options = pa_csv.ConvertOptions(
+        column_types={name: pa.string() for name in names},
+        null_values=CSV_NA_VALUES,
+        strings_can_be_null=True,
     )
+    table = pa_csv.read_csv(
+        pa.BufferReader(raw), read_options=read_options, parse_options=parse_options, convert_options=convert_options
+    )
+    dtype = arrow_string_dtype()
+    df = table.to_pandas(types_mapper=lambda t: dtype if t == pa.string() else None)
+    if not has_header:
+        df.columns = range(df.shape[1])
+    return df
 
-    try:
+
+def read_csv_bytes(
+    raw: bytes, sep: str, has_header: bool, arrow: bool = False, profile: "PipelineProfile" = None
+) -> pd.DataFrame:
+    """
+    Lee el CSV desde los bytes subidos. Con arrow=True usa read_csv_arrow y, si no se puede,
+    vuelve al lector de texto (read_csv_text).
+    """
+    if profile is None:
+        profile = PipelineProfile()
+    if arrow:
+        try:
+            with profile.stage("read (arrow)") as stage:
+                df = read_csv_arrow(raw, sep, has_header)
+                stage["filas"] = len(df)
+        except ValueError:
+            pass
+        else:
+            with profile.stage("ensure_min_columns", rows=len(df)):
+                df = ensure_min_columns(df, has_header, copy=False)
+            with profile.stage("dtypes compactos", rows=len(df)):
+                return compact_dtypes(df, COMPACT_INPUT_COLUMNS + repeated_text_columns(df), copy=False)
+    return read_csv_text(decode_csv_bytes(raw), sep=sep, has_header=has_header, profile=profile)
+
+
+def read_csv_text(raw_text: str, sep: str, has_header: bool, profile: "PipelineProfile" = None) -> pd.DataFrame:
+    """Lee el CSV (todo como texto), asegura las columnas A..O y compacta las columnas repetidas."""
+    if profile is None:
+        profile = PipelineProfile()
+    with profile.stage("read") as stage:
         if has_header:
             df = pd.read_csv(StringIO(raw_text), sep=sep, dtype=str, keep_default_na=True)
         else:
             df = pd.read_csv(StringIO(raw_text), sep=sep, header=None, dtype=str, keep_default_na=True)
+        stage["filas"] = len(df)
+    with profile.stage("ensure_min_columns", rows=len(df)):
+        df = ensure_min_columns(df, has_header, copy=False)
+    with profile.stage("dtypes compactos", rows=len(df)):
+        return compact_dtypes(df, COMPACT_INPUT_COLUMNS + repeated_text_columns(df), copy=False)
+
+
+def current_rss_bytes() -> int:
+    """Memoria residente del proceso (Linux, /proc); 0 si no está disponible."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+class PipelineProfile:
+    """
+    Medición por etapa del pipeline: tiempo, filas, delta de memoria (RSS) y, en la
+    etapa de fechas, cuántos valores necesitaron inferencia (fallbacks_fecha) y el
+    orden de fecha elegido (dayfirst); en las descargas, el tamaño generado (bytes).
+    Con cprofile=True además junta un cProfile de todas las etapas medidas.
+    """
+
+    def __init__(self, cprofile: bool = False):
+        self.stages = []
+        self._profiler = cProfile.Profile() if cprofile else None
+
+    @contextmanager
+    def stage(self, name: str, rows: int = 0):
+        """Mide el bloque `with`; el dict entregado admite campos extra (ej: filas)."""
+        record = {"etapa": name, "filas": rows}
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        if self._profiler is not None:
+            self._profiler.enable()
+        try:
+            yield record
+        finally:
+            if self._profiler is not None:
+                self._profiler.disable()
+            record["segundos"] = round(time.perf_counter() - start, 4)
+            record["memoria_mb"] = round((current_rss_bytes() - rss_before) / 1024 ** 2, 1)
+            self.stages.append(record)
+
+    @property
+    def dayfirst(self):
+        """dayfirst (MDY/DMY) que decidió el pipeline medido; None si ninguna etapa lo registró."""
+        decided = [s["dayfirst"] for s in self.stages if s.get("dayfirst") is not None]
+        return decided[-1] if decided else None
+
+    @property
+    def total_seconds(self) -> float:
+        return round(sum(s["segundos"] for s in self.stages), 4)
+
+    def to_frame(self) -> pd.DataFrame:
+        columns = ["etapa", "filas", "segundos", "memoria_mb", "fallbacks_fecha", "bytes"]
+        return pd.DataFrame(self.stages).reindex(columns=columns)
+
+    def to_json(self) -> str:
+        return json.dumps({"total_segundos": self.total_seconds, "etapas": self.stages}, ensure_ascii=False, indent=2)
+
+    def cprofile_bytes(self) -> bytes:
+        """Estadísticas de cProfile (formato pstats); b"" si no se pidió cProfile."""
+        if self._profiler is None:
+            return b""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "pipeline.prof")
+            self._profiler.dump_stats(path)
+            with open(path, "rb") as f:
+                return f.read()
+
+
+def pipeline_copy(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Copia de `df` sobre la que run_pipeline puede escribir sin tocar `df`. Comparte las
+    columnas de entrada y copia solo K/L, las únicas que las etapas escriben en el lugar
+    (N, J y O se reemplazan enteras). No depende de Copy-on-Write (pandas < 3).
+    """
+    df_out = df.copy(deep=False)
+    for idx in (IDX_K_MIN, IDX_L_MAX):
+        df_out.isetitem(idx, df_out.iloc[:, idx].copy())
+    return df_out
+
+
+def run_pipeline(
+    df: pd.DataFrame,
+    date_mode: str,
+    dates: DateStore = None,
+    rows: RowIndex = None,
+    single_key: bool = None,
+    bol_to_n: dict = None,
+    min_map: dict = None,
+    max_map: dict = None,
+    stage=None,
+) -> tuple[pd.DataFrame, DateStore, RowIndex]:
+    """
+    Etapas N -> N desde contenedores -> mapas min/max -> K/L -> J -> O, escribiendo sobre
+    `df`: debe ser propio (ej: un bloque recién leído) o una pipeline_copy.
+
+    El resultado de un BOL depende solo de sus propias filas (la fila BILL_OF_LADING y sus
+    CONTAINER con el mismo C), salvo dos decisiones de todo el archivo: dayfirst (AUTO, junto
+    con los formatos de fecha detectados) y "1 único C". Con esas decisiones fijas, correr
+    las etapas sobre un grupo de BOL completos da lo mismo que sobre el archivo entero: en
+    eso se apoyan los motores paralelo e incremental.
+
+    Lo que normalmente sale del propio `df` se puede fijar desde afuera (motores paralelo,
+    streaming e incremental):
+    - dates: DateStore ya armado (ej: con dayfirst y formatos de todo el archivo)
+    - rows: RowIndex ya calculado
+    - single_key: caso "1 único C"
+    - bol_to_n, min_map/max_map: mapas por BOL desde contenedores (ej: de otra pasada)
+    `stage(nombre)` entrega el context manager que mide cada etapa (ej: PipelineProfile.stage).
+    Devuelve (df, dates, rows).
+    """
+    if stage is None:
+        def stage(name):
+            return nullcontext({})
+
+    with stage("N (valor priorizado)"):
+        df = compute_valor_priorizado(df, copy=False)
+
+    # Cada fecha de G/H se parsea una sola vez y cada fila se clasifica una sola vez;
+    # todas las etapas comparten ambos índices
+    with stage("fechas y clasificación") as record:
+        if dates is None:
+            dates = DateStore.from_frame(df, date_mode)
+        if rows is None:
+            rows = RowIndex(df)
+        record["fallbacks_fecha"] = dates.fallback_count
+        record["dayfirst"] = dates.dayfirst
+
+    # N para BOL se completa desde contenedores si su G/H están vacíos
+    with stage("N desde contenedores"):
+        df = fill_n_for_bol_from_containers(
+            df, date_mode=date_mode, dates=dates, bol_to_n=bol_to_n, copy=False, rows=rows
+        )
+
+    # Min/Max desde contenedores ignorando "No Valido"
+    if min_map is None or max_map is None:
+        with stage("mapas min/max"):
+            min_map, max_map = compute_min_max_maps_from_containers(df, date_mode=date_mode, dates=dates, rows=rows)
+
+    with stage("K/L"):
+        df = fill_k_l_for_container_rows(df, min_map=min_map, max_map=max_map, copy=False, rows=rows)
+        df = fill_k_l_for_bol_rows_from_containers(
+            df,
+            min_map=min_map,
+            max_map=max_map,
+            date_mode=date_mode,
+            dates=dates,
+            single_key=single_key,
+            copy=False,
+            rows=rows,
+        )
+
+    with stage("J"):
+        df = fill_hours_diff_in_j(df, date_mode=date_mode, dates=dates, copy=False)
+    with stage("O"):
+        df = fill_range_in_o(df, copy=False)
+    return df, dates, rows
+
+
+def process(
+    df: pd.DataFrame, date_mode: str, profile: PipelineProfile = None
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Pipeline completo sin UI: devuelve (Archivo completo, Tabla Resumen).
+    `df` debe venir con A..O (ver read_csv_text / ensure_min_columns); no se modifica.
+    `profile` recibe la medición de cada etapa.
+    """
+    if profile is None:
+        profile = PipelineProfile()
+    n = len(df)
+
+    df_out, _, rows = run_pipeline(pipeline_copy(df), date_mode, stage=lambda name: profile.stage(name, rows=n))
+
+    with profile.stage("Tabla Resumen", rows=n):
+        resumen = build_summary_counts(df_out, rows=rows)
+    with profile.stage("dtypes compactos", rows=n):
+        df_out = compact_dtypes(df_out, COMPACT_OUTPUT_COLUMNS, copy=False)
+    return df_out, resumen
+
+
+def estimate_nbytes(value) -> int:
+    """
+    Tamaño aproximado en memoria (para acotar la caché). RowIndex y PipelineProfile se
+    miden por sus atributos; los arrays de objetos incluyen sus strings.
+    """
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, pd.Categorical):
+        return int(pd.Series(value).memory_usage(index=False, deep=True))
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            return int(pd.Series(value, dtype=object, copy=False).memory_usage(index=False, deep=True))
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(estimate_nbytes(k) + estimate_nbytes(v) for k, v in value.items())
+    if isinstance(value, (RowIndex, PipelineProfile)):
+        return estimate_nbytes(vars(value))
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """
+    Caché LRU acotada por tamaño (bytes). Las claves son tuplas
+    (etapa, hash del archivo, delimitador, header, date_mode, ...); al superar
+    `max_bytes` se descartan primero las entradas usadas hace más tiempo.
+    Los valores guardados no deben modificarse (se comparten entre sesiones).
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value) -> None:
+        nbytes = estimate_nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self.total_bytes += nbytes
+            # La entrada recién agregada se conserva aunque sola supere el límite
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, old_nbytes) = self._entries.popitem(last=False)
+                self.total_bytes -= old_nbytes
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def discard(self, prefix: tuple) -> None:
+        """Descarta las entradas cuya clave empieza con `prefix`."""
+        with self._lock:
+            for key in [k for k in self._entries if k[:len(prefix)] == prefix]:
+                self.total_bytes -= self._entries.pop(key)[1]
+
+
+def file_sha256(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+
+NOT_ENOUGH_COLUMNS = "El archivo no tiene suficientes columnas para llegar hasta la columna O (A..O)."
+
+
+def finish_processing(
+    df: pd.DataFrame, sep: str, has_header: bool, date_mode: str, profile: PipelineProfile, workers: int = 1
+) -> tuple:
+    """
+    process + CSV de la Tabla Resumen: (df_out, resumen, resumen_csv, profile).
+    Con workers > 1 usa el motor paralelo (mismo resultado, ver parallel.py).
+    El Archivo completo se arma recién al pedir su descarga (ver full_download_button).
+    """
+    if workers > 1:
+        from parallel import process_parallel  # parallel importa app: import diferido
+
+        df_out, resumen = process_parallel(df, date_mode, workers=workers, profile=profile)
+    else:
+        df_out, resumen = process(df, date_mode=date_mode, profile=profile)
+    resumen_csv = to_csv_bytes(resumen, sep=",", include_header=True)
+    return df_out, resumen, resumen_csv, profile
+
+
+def process_upload(raw: bytes, sep: str, has_header: bool, date_mode: str, arrow: bool = False) -> tuple:
+    """Lectura + finish_processing de un archivo subido."""
+    profile = PipelineProfile()
+    df = read_csv_bytes(raw, sep=sep, has_header=has_header, arrow=arrow, profile=profile)
+    if df.shape[1] < MIN_COLS_A_TO_O:
+        raise ValueError(NOT_ENOUGH_COLUMNS)
+    return finish_processing(df, sep, has_header, date_mode, profile)
+
+
+def combine_summaries(outputs: list) -> pd.DataFrame:
+    """Tabla Resumen de varios Archivo completo: BL únicos por col A entre todos (gana el primero)."""
+    parts = []
+    for df_out in outputs:
+        bol = df_out.iloc[np.flatnonzero(RowIndex(df_out).mask_bol), :MIN_COLS_A_TO_O]
+        parts.append(bol.set_axis(range(MIN_COLS_A_TO_O), axis=1))
+    if not parts:
+        return build_summary_counts(pd.DataFrame(columns=range(MIN_COLS_A_TO_O)))
+    return build_summary_counts(pd.concat(parts, ignore_index=True))
+
+
+def sample_blocks(raw: bytes, has_header: bool, head_rows: int, n_blocks: int, block_rows: int, seed: int) -> dict:
+    """
+    Trozos de líneas completas de `raw` (bytes): encabezado, las primeras `head_rows` filas
+    y `n_blocks` bloques de ~`block_rows` filas desde posiciones al azar (sin solaparse).
+    "exacto" = True si las primeras filas ya cubren el archivo entero.
+    """
+    def line_end(pos: int, n_lines: int) -> int:
+        for _ in range(n_lines):
+            nl = raw.find(b"\n", pos)
+            if nl < 0:
+                return len(raw)
+            pos = nl + 1
+        return pos
+
+    header_end = line_end(0, 1) if has_header else 0
+    head_end = line_end(header_end, head_rows)
+    out = {"header": raw[:header_end], "head": raw[header_end:head_end], "blocks": [], "exacto": head_end >= len(raw)}
+    if out["exacto"]:
+        return out
+
+    rng = np.random.default_rng(seed)
+    last_end = head_end
+    for offset in np.sort(rng.integers(head_end, len(raw), size=n_blocks)):
+        start = max(line_end(int(offset), 1), last_end)  # desde la línea siguiente (la actual puede estar cortada)
+        end = line_end(start, block_rows)
+        if end > start:
+            out["blocks"].append(raw[start:end])
+            last_end = end
+    return out
+
+
+def group_runs(df: pd.DataFrame) -> np.ndarray:
+    """Número de grupo por fila: filas consecutivas con el mismo C (limpio) forman un grupo."""
+    keys = clean_text_values(df.iloc[:, IDX_C_BOL]).fillna("")
+    return (keys != keys.shift()).cumsum().to_numpy()
+
+
+def complete_group_weights(runs: np.ndarray, block_ids: np.ndarray) -> np.ndarray:
+    """
+    Peso por fila para estimar totales desde bloques (block_ids: 0 = primeras filas del
+    archivo, 1.. = bloques al azar). Se descartan (peso 0) los grupos que pueden estar
+    cortados: el último de cada bloque y, en los bloques al azar, también el primero.
+    En un bloque al azar de L filas un grupo de g filas queda entero y sin ser el primero
+    ni el último en L - g - 1 de cada L posiciones del bloque: pesa L / (L - g - 1).
+    """
+    frame = pd.DataFrame({"run": runs, "block": block_ids})
+    size = frame.groupby("run")["run"].transform("size").to_numpy(dtype=np.float64)
+    by_block = frame.groupby("block")["run"]
+    block_rows = by_block.transform("size").to_numpy(dtype=np.float64)
+    random_block = block_ids > 0
+    edge = (runs == by_block.transform("last").to_numpy()) | (random_block & (runs == by_block.transform("first").to_numpy()))
+    weights = np.where(random_block, block_rows / np.maximum(block_rows - size - 1, 1), 1.0)
+    return np.where(edge, 0.0, weights)
+
+
+def ratio_bounds(y: np.ndarray, m: np.ndarray, total: float) -> tuple[float, float, float]:
+    """
+    Estimación de un total como (suma y / suma m) * total, con intervalo del 95 %
+    (muestreo por conglomerados: cada bloque leído es un conglomerado).
+    """
+    r = y.sum() / m.sum()
+    n = len(y)
+    if n < 2:
+        return r * total, r * total, r * total
+    se = np.sqrt(((y - r * m) ** 2).sum() / (n * (n - 1))) / m.mean()
+    return r * total, max(0.0, r - QUICK_SCAN_Z * se) * total, (r + QUICK_SCAN_Z * se) * total
 
-        df = ensure_min_columns(df, has_header)
 
-        if df.shape[1] < MIN_COLS_A_TO_O:
-            st.error("El archivo no tiene suficientes columnas para llegar hasta la columna O (A..O).")
-            st.stop()
+def delimiter_columns(raw: bytes) -> pd.DataFrame:
+    """Cantidad de columnas de la primera línea con cada delimitador candidato."""
+    first = decode_csv_bytes(raw[:65536]).splitlines()[:1] or [""]
+    return pd.DataFrame([
+        {"delimitador": repr(sep), "columnas": len(next(csv.reader(first, delimiter=sep)))}
+        for sep in [",", ";", "\t", "|"]
+    ])
 
-        if st.button("Procesar"):
-            df_out = compute_valor_priorizado(df)
 
-            # N para BOL se completa desde contenedores si su G/H están vacíos
-            df_out = fill_n_for_bol_from_containers(df_out, date_mode=date_mode)
+def read_sample_blocks(sample: dict, sep: str, has_header: bool) -> tuple[pd.DataFrame, np.ndarray, int]:
+    """
+    Lee las primeras filas y los bloques al azar en un único DataFrame.
+    Devuelve (frame, bloque de cada fila (0 = primeras filas), columnas leídas).
+    """
+    first = pd.read_csv(
+        StringIO(decode_csv_bytes(sample["header"] + sample["head"])),
+        sep=sep,
+        header=0 if has_header else None,
+        dtype=str,
+        keep_default_na=True,
+    )
+    frames, block_ids = [first], [np.zeros(len(first), dtype=np.int64)]
+    if sample["blocks"]:
+        lines = [block.count(b"\n") + (not block.endswith(b"\n")) for block in sample["blocks"]]
+        try:
+            rest = pd.read_csv(
+                StringIO(decode_csv_bytes(b"".join(b if b.endswith(b"\n") else b + b"\n" for b in sample["blocks"]))),
+                sep=sep,
+                header=None,
+                dtype=str,
+                keep_default_na=True,
+            )
+        except (ValueError, pd.errors.ParserError):
+            rest = None
+        # Una línea con comillas y saltos de línea desalinea los bloques: en ese caso solo las primeras filas
+        if rest is not None and rest.shape[1] == first.shape[1] and len(rest) == sum(lines):
+            frames.append(rest.set_axis(first.columns, axis=1))
+            block_ids.append(np.repeat(np.arange(1, len(lines) + 1), lines))
 
-            # Min/Max desde contenedores ignorando "No Valido"
-            min_map, max_map = compute_min_max_maps_from_containers(df_out, date_mode=date_mode)
+    df = pd.concat(frames, ignore_index=True)
+    n_columns = df.shape[1]
+    return ensure_min_columns(df, has_header, copy=False), np.concatenate(block_ids), n_columns
 
-            df_out = fill_k_l_for_container_rows(df_out, min_map=min_map, max_map=max_map)
-            df_out = fill_k_l_for_bol_rows_from_containers(df_out, min_map=min_map, max_map=max_map, date_mode=date_mode)
 
-            df_out = fill_hours_diff_in_j(df_out, date_mode=date_mode)
-            df_out = fill_range_in_o(df_out)
+def quick_scan(raw: bytes, sep: str, has_header: bool, date_mode: str, seed: int = 0) -> dict:
+    """
+    Vista rápida sobre una muestra: las primeras QUICK_SCAN_HEAD_ROWS filas y
+    QUICK_SCAN_BLOCKS bloques al azar, con las mismas etapas que process().
+    Devuelve la Tabla Resumen estimada para el archivo entero y diagnósticos de delimitador
+    y fechas. Las primeras filas se cuentan tal cual; el resto del archivo se estima desde
+    los bloques al azar (intervalo del 95 %, cada bloque es un conglomerado). Los BL
+    repetidos (col A) entre bloques distintos no se detectan: la estimación supone BL únicos.
+    """
+    start = time.perf_counter()
+    sample = sample_blocks(raw, has_header, QUICK_SCAN_HEAD_ROWS, QUICK_SCAN_BLOCKS, QUICK_SCAN_BLOCK_ROWS, seed)
+    df, block_ids, n_columns = read_sample_blocks(sample, sep, has_header)
+    df_out, resumen = process(df, date_mode=date_mode)
+
+    if sample["exacto"]:
+        total_rows = len(df)
+        table = resumen.assign(estimado=resumen["valor"], minimo=resumen["valor"], maximo=resumen["valor"])
+    else:
+        # Filas del archivo: bytes de datos / bytes por fila de la muestra
+        pieces = [sample["head"]] + sample["blocks"]
+        sampled_bytes = sum(len(b) for b in pieces)
+        total_rows = (len(raw) - len(sample["header"])) / max(sampled_bytes, 1) * len(df)
+
+        runs = group_runs(df_out) + block_ids * (len(df_out) + 1)  # un grupo no cruza bloques
+        weights = complete_group_weights(runs, block_ids)
+        flags = summary_flags(df_out)
+        weighted = flags.astype(np.float64).mul(weights[flags.index], axis=0)
+        y = weighted.groupby(block_ids[flags.index]).sum().reindex(np.unique(block_ids), fill_value=0.0)
+        m = pd.Series(1.0, index=block_ids).groupby(level=0).sum()
+
+        # Primeras filas: conteo exacto de sus grupos completos; resto: bloques al azar
+        head_rows = float(((block_ids == 0) & (weights > 0)).sum())
+        head, rest = y.loc[[0]].sum(), y.drop(index=0)
+        rest_rows = max(total_rows - head_rows, 0.0)
+        rows = [
+            tuple(head[name] + v for v in ratio_bounds(rest[name].to_numpy(), m.drop(index=0).to_numpy(), rest_rows))
+            if len(rest) else (head[name],) * 3
+            for name in SUMMARY_INDICATORS
+        ]
+        table = resumen.assign(
+            estimado=[round(r[0]) for r in rows],
+            minimo=[round(r[1]) for r in rows],
+            maximo=[round(r[2]) for r in rows],
+        )
+
+    # Fechas: parseos MDY/DMY (AUTO) y proporción de G/H no vacías que parsean con el modo elegido
+    dates = DateStore.from_frame(df, date_mode)
+    values = clean_date_values(pd.concat([df.iloc[:, IDX_H_ACTUAL], df.iloc[:, IDX_G_ESTIMATED]], ignore_index=True))
+    counts = dates.count_parsed(values)
+    present = int(values.notna().sum())
+    parsed = int(dates.to_datetime(values).notna().sum())
+
+    return {
+        "exacto": sample["exacto"],
+        "filas_muestra": len(df),
+        "filas_estimadas": int(round(total_rows)),
+        "bloques": int(block_ids.max(initial=0)),
+        "columnas": n_columns,
+        "resumen": table.rename(columns={"valor": "muestra"}),
+        "delimitadores": delimiter_columns(raw),
+        "fechas": {
+            "parseos_mdy": counts[False],
+            "parseos_dmy": counts[True],
+            "dayfirst": bool(dates.dayfirst),
+            "formato": dates.formats.get(dates.dayfirst, ""),
+            "fallbacks": dates.fallback_count,
+            "proporcion_parseada": parsed / present if present else 1.0,
+        },
+        "segundos": round(time.perf_counter() - start, 3),
+    }
+
+
+# ---------------- Streamlit UI ----------------
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    return ResultCache(CACHE_MAX_BYTES)
+
 
-            resumen = build_summary_counts(df_out)
+def uploaded_file_hash(uploaded) -> str:
+    """Hash del contenido, calculado una sola vez por archivo subido (no en cada rerun)."""
+    file_id = getattr(uploaded, "file_id", None)
+    hashes = st.session_state.setdefault("file_hashes", {})
+    if file_id is None or file_id not in hashes:
+        digest = file_sha256(uploaded.getvalue())
+        if file_id is None:
+            return digest
+        hashes[file_id] = digest
+    return hashes[file_id]
+
+
+def show_single_file(uploaded, has_header: bool) -> None:
+    cache = get_result_cache()
+    raw = uploaded.getvalue()
+    file_hash = uploaded_file_hash(uploaded)
+
+    detected = cache.get_or_compute(("sniff", file_hash), lambda: sniff_delimiter(decode_csv_bytes(raw[:65536])))
+    sep = st.selectbox("Delimitador", options=[detected, ",", ";", "\t", "|"], index=0)
+    date_mode, use_arrow, export_format, compression, use_cprofile, keep, workers = processing_options()
+
+    try:
+        # Vista rápida sobre una muestra; el archivo completo se lee recién al presionar Procesar
+        scan = cache.get_or_compute(
+            ("quick_scan", file_hash, sep, has_header, date_mode),
+            lambda: quick_scan(raw, sep, has_header, date_mode),
+        )
+        show_quick_scan(scan)
+
+        read_key = (file_hash, sep, has_header, use_arrow)
+        process_key = read_key + (date_mode,)
+        clicked = st.button("Procesar")
+        if clicked:
+            st.session_state["processed_key"] = process_key
+
+        # El resultado sigue visible en los reruns (filtros y páginas del explorador)
+        if st.session_state.get("processed_key") == process_key:
+            # Un solo perfil para lectura y cálculo: el cProfile incluye la lectura del CSV
+            profile = PipelineProfile(cprofile=use_cprofile)
+
+            def read():
+                return read_csv_bytes(raw, sep=sep, has_header=has_header, arrow=use_arrow, profile=profile)
+
+            # La medición de la lectura se guarda junto al resultado (en caché no se vuelve a leer)
+            if use_cprofile and clicked:
+                df = read()
+                cache.put(("read",) + read_key, df)
+                cache.put(("profile.read",) + read_key, list(profile.stages))
+            else:
+                df = cache.get_or_compute(("read",) + read_key, read)
+                profile.stages = list(cache.get_or_compute(("profile.read",) + read_key, lambda: list(profile.stages)))
+
+            if df.shape[1] < MIN_COLS_A_TO_O:
+                st.error(NOT_ENOUGH_COLUMNS)
+                st.stop()
+
+            def compute_all():
+                return finish_processing(df, sep, has_header, date_mode, profile, workers=workers)
+
+            if use_cprofile and clicked:
+                result = compute_all()
+                cache.put(("process",) + process_key, result)
+            else:
+                result = cache.get_or_compute(("process",) + process_key, compute_all)
+            df_out, resumen, resumen_csv, run_profile = result
 
             st.success("Listo.")
 
             st.subheader("Tabla Resumen")
-            st.dataframe(resumen, use_container_width=True)
+            st.dataframe(resumen, width="stretch")
 
             st.download_button(
                 "Descargar Tabla Resumen.csv",
-                data=to_csv_bytes(resumen, sep=",", include_header=True),
+                data=resumen_csv,
                 file_name="Tabla Resumen.csv",
                 mime="text/csv",
             )
+            full_download_button(cache, process_key, result, sep, has_header, export_format, compression)
+            show_summary_cube(cache, process_key, df_out, date_mode, run_profile.dayfirst)
+            if keep:
+                store_in_background(cache, process_key, df_out, uploaded.name, start=clicked)
+
+            show_results_explorer(cache, process_key, df_out)
+
+            with st.expander("Rendimiento"):
+                if run_profile is not profile:
+                    st.caption("Resultado desde caché: medición de la ejecución original.")
+                st.write(f"Total: {run_profile.total_seconds:.2f} s")
+                st.dataframe(run_profile.to_frame(), width="stretch")
+                st.download_button(
+                    "Descargar medición (JSON)",
+                    data=run_profile.to_json().encode("utf-8"),
+                    file_name="Rendimiento.json",
+                    mime="application/json",
+                )
+                prof = run_profile.cprofile_bytes()
+                if prof:
+                    st.download_button(
+                        "Descargar cProfile (.prof)",
+                        data=prof,
+                        file_name="Rendimiento.prof",
+                        mime="application/octet-stream",
+                    )
 
-            st.download_button(
-                "Descargar Archivo completo.csv",
-                data=to_csv_bytes(df_out, sep=sep, include_header=has_header),
-                file_name="Archivo completo.csv",
-                mime="text/csv",
+    except Exception as e:
+        st.error(f"Error leyendo o procesando el CSV: {e}")
+
+
+def show_summary_cube(
+    cache: ResultCache, process_key: tuple, df_out: pd.DataFrame, date_mode: str, dayfirst: bool
+) -> None:
+    """Tabla Resumen por dimensiones: el cubo se arma una vez por resultado y cada vista es un corte."""
+    with st.expander("Tabla Resumen por dimensión"):
+        by = st.multiselect("Agrupar por", options=list(SUMMARY_DIMENSIONS), default=["Mes de N"])
+        cube = cache.get_or_compute(
+            ("cubo",) + process_key,
+            lambda: build_summary_cube(df_out, list(SUMMARY_DIMENSIONS), date_mode=date_mode, dayfirst=dayfirst),
+        )
+        table = slice_summary_cube(cube, by=by).reset_index()
+        if not by:
+            table = table.drop(columns="index")
+        st.dataframe(table, hide_index=True, width="stretch")
+        st.download_button(
+            "Descargar Tabla Resumen por dimensión.csv",
+            data=to_csv_bytes(table, sep=",", include_header=True),
+            file_name="Tabla Resumen por dimensión.csv",
+            mime="text/csv",
+        )
+
+
+def show_results_explorer(cache: ResultCache, process_key: tuple, df_out: pd.DataFrame) -> None:
+    """
+    Explorador del Archivo completo: los filtros se aplican en el servidor (filter_rows) y
+    solo la página visible (RESULTS_PAGE_ROWS filas) se envía al navegador.
+    """
+    st.subheader("Explorar Archivo completo")
+    rows = cache.get_or_compute(("rows",) + process_key, lambda: RowIndex(df_out))
+    col1, col2, col3, col4 = st.columns(4)
+    types = col1.multiselect("Shipment type (col B)", options=list(rows.shipment_type.categories))
+    ranges = col2.multiselect("RANGO DIFERENCIA (col O)", options=RANGE_BUCKETS)
+    bol = col3.text_input("BOL (col C) contiene")
+    only_no_valido = col4.checkbox('Solo filas con "No Valido" (N/K/L/O)')
+
+    filters = (tuple(types), tuple(ranges), bol.strip(), only_no_valido)
+    positions = cache.get_or_compute(
+        ("filtro",) + filters + process_key,
+        lambda: filter_rows(df_out, rows, types, ranges, bol, only_no_valido),
+    )
+    n_pages = max(1, -(-len(positions) // RESULTS_PAGE_ROWS))
+    # Una sola clave para la página: al cambiar los filtros (o el archivo) se vuelve a la 1
+    if st.session_state.get("pagina_filtros") != filters + process_key:
+        st.session_state["pagina_filtros"] = filters + process_key
+        st.session_state["pagina"] = 1
+    page = st.number_input(f"Página (de {n_pages})", min_value=1, max_value=n_pages, key="pagina")
+    window = positions[(page - 1) * RESULTS_PAGE_ROWS:page * RESULTS_PAGE_ROWS]
+    st.caption(f"{len(positions)} de {len(df_out)} filas; el índice es la fila en el archivo.")
+    st.dataframe(to_display_frame(df_out.iloc[window]), width="stretch")
+
+
+def show_quick_scan(scan: dict) -> None:
+    """Tabla Resumen estimada y diagnósticos de la vista rápida (ver quick_scan)."""
+    st.subheader("Vista rápida")
+    if scan["exacto"]:
+        st.caption(f"Archivo leído completo ({scan['filas_muestra']} filas, {scan['segundos']:.2f} s): valores exactos.")
+    else:
+        st.caption(
+            f"Muestra de {scan['filas_muestra']} filas (primeras filas + {scan['bloques']} bloques al azar) "
+            f"de ~{scan['filas_estimadas']} filas, {scan['segundos']:.2f} s. "
+            "Estimado para el archivo completo con intervalo del 95 % (mínimo / máximo)."
+        )
+    st.dataframe(scan["resumen"], width="stretch")
+
+    if scan["columnas"] < MIN_COLS_A_TO_O:
+        st.warning(f"Con este delimitador se leen {scan['columnas']} columnas (se esperan A..O): revisa el delimitador.")
+    fechas = scan["fechas"]
+    with st.expander("Diagnóstico de delimitador y fechas"):
+        st.write("Columnas de la primera línea con cada delimitador:")
+        st.dataframe(scan["delimitadores"], hide_index=True)
+        st.write(
+            f"Fechas como {'DMY' if fechas['dayfirst'] else 'MDY'} "
+            f"(formato {fechas['formato'] or 'inferido'}); "
+            f"G/H que calzan con cada formato: MDY {fechas['parseos_mdy']}, DMY {fechas['parseos_dmy']}."
+        )
+        st.write(
+            f"G/H no vacías que parsean: {fechas['proporcion_parseada']:.1%} "
+            f"({fechas['fallbacks']} por inferencia)."
+        )
+    st.caption("Si el delimitador y el formato de fecha son correctos, presiona Procesar para el cálculo completo.")
+
+
+def show_multiple_files(uploads: list, has_header: bool) -> None:
+    """
+    Varios CSV, cada uno con su delimitador detectado. Con la opción de procesar en paralelo
+    cada archivo va a un proceso del pool (parallel.process_pool); si no, uno tras otro.
+    """
+    cache = get_result_cache()
+    date_mode, use_arrow, export_format, compression, _, keep, workers = processing_options(allow_cprofile=False)
+
+    files = []
+    for uploaded in uploads:
+        raw = uploaded.getvalue()
+        file_hash = uploaded_file_hash(uploaded)
+        sep = cache.get_or_compute(("sniff", file_hash), lambda: sniff_delimiter(decode_csv_bytes(raw[:65536])))
+        files.append({"name": uploaded.name, "raw": raw, "key": (file_hash, sep, has_header, use_arrow, date_mode)})
+
+    st.caption(f"{len(files)} archivos; el delimitador se detecta en cada uno.")
+    batch_key = tuple(f["key"] for f in files)
+    clicked = st.button("Procesar")
+    if clicked:
+        st.session_state["processed_batch"] = batch_key
+    # El resultado sigue visible en los reruns (ej: descargas); lo ya procesado sale de la caché
+    if st.session_state.get("processed_batch") != batch_key:
+        return
+
+    results = [cache.get(("process",) + f["key"]) for f in files]
+    status = ["en caché" if r is not None else "en cola" for r in results]
+    pending = [i for i, r in enumerate(results) if r is None]
+
+    progress = st.progress(0.0, text="Procesando...")
+    status_table = st.empty()
+
+    def show_status():
+        done = sum(s != "en cola" for s in status)
+        progress.progress(done / len(files), text=f"{done} de {len(files)} archivos")
+        status_table.dataframe(
+            pd.DataFrame({"archivo": [f["name"] for f in files], "estado": status}), width="stretch"
+        )
+
+    def finish(i, get_result):
+        try:
+            results[i] = get_result()
+        except Exception as e:
+            status[i] = f"error: {e}"
+        else:
+            cache.put(("process",) + files[i]["key"], results[i])
+            status[i] = f"listo ({len(results[i][0])} filas, {results[i][3].total_seconds:.1f} s)"
+        show_status()
+
+    def job(i):
+        return files[i]["raw"], files[i]["key"][1], has_header, date_mode, use_arrow
+
+    show_status()
+    # Procesos y no hilos: casi todo el cálculo (factorize y to_datetime sobre objetos, limpieza
+    # de valores) retiene el GIL, así que un pool de hilos no superpone casi nada
+    if workers > 1 and len(pending) > 1:
+        from parallel import process_pool, process_upload_job  # parallel importa app: import diferido
+
+        with process_pool(min(len(pending), workers)) as pool:
+            futures = {pool.submit(process_upload_job, *job(i)): i for i in pending}
+            for future in as_completed(futures):
+                finish(futures[future], future.result)
+    else:
+        for i in pending:
+            finish(i, lambda: process_upload(*job(i)))
+
+    done = [(f, r) for f, r in zip(files, results) if r is not None]
+    if not done:
+        st.error("No se pudo procesar ningún archivo.")
+        return
+
+    st.success(f"Listo: {len(done)} de {len(files)} archivos.")
+    st.subheader("Tabla Resumen consolidada")
+    st.caption("BL únicos por col A entre todos los archivos (si se repite, cuenta el primer archivo de la lista).")
+    combined = combine_summaries([r[0] for _, r in done])
+    st.dataframe(combined, width="stretch")
+    st.download_button(
+        "Descargar Tabla Resumen consolidada.csv",
+        data=to_csv_bytes(combined, sep=",", include_header=True),
+        file_name="Tabla Resumen consolidada.csv",
+        mime="text/csv",
+    )
+
+    for i, (f, result) in enumerate(done):
+        with st.expander(f["name"]):
+            st.dataframe(result[1], width="stretch")
+            stem = f["name"].rsplit(".", 1)[0]
+            full_download_button(
+                cache, f["key"], result, f["key"][1], has_header, export_format, compression,
+                prefix=f"{stem} - ", key=f"completo-{i}",
             )
+            if keep:
+                store_in_background(cache, f["key"], result[0], f["name"], start=clicked)
 
-            with st.expander("Vista previa (primeras 20 filas)"):
-                st.dataframe(df_out.head(20), use_container_width=True)
 
-    except Exception as e:
-        st.error(f"Error leyendo o procesando el CSV: {e}")
+def processing_options(allow_cprofile: bool = True):
+    """
+    Controles comunes: modo de fecha, lector Arrow, formato y compresión de descarga, cProfile,
+    almacén y procesos (1 = sin paralelo).
+    """
+    date_mode = st.selectbox(
+        "Formato de fecha para cálculos (N/K/L)",
+        options=["AUTO", "MDY", "DMY"],
+        index=0,
+    )
+    use_arrow = pa is not None and st.checkbox("Lectura rápida con Arrow (multihilo)", value=True)
+    export_options = list(EXPORT_FORMATS) if pa is not None else ["CSV"]
+    export_format = st.radio("Formato del Archivo completo", options=export_options, index=0, horizontal=True)
+    compression = st.radio("Compresión de la descarga", options=list(COMPRESSIONS), index=0, horizontal=True)
+    use_cprofile = allow_cprofile and st.checkbox(
+        "Medir con cProfile (más lento; recalcula aunque esté en caché)", value=False
+    )
+    keep = st.checkbox("Guardar el resultado en el almacén local (búsqueda por BOL / Shipment ID)", value=False)
+    workers = 1
+    # Apagado por defecto: cada Procesar levanta procesos nuevos dentro del servidor (ver parallel.py)
+    if PROCESS_WORKERS > 1 and st.checkbox(f"Procesar en paralelo ({PROCESS_WORKERS} procesos)", value=False):
+        workers = PROCESS_WORKERS
+    return date_mode, use_arrow, export_format, compression, use_cprofile, keep, workers
+
+
+def full_download_button(
+    cache: ResultCache,
+    process_key: tuple,
+    result: tuple,
+    sep: str,
+    has_header: bool,
+    export_format: str,
+    compression: str,
+    prefix: str = "",
+    key: str = None,
+):
+    """
+    Botón de descarga del Archivo completo. El archivo se genera recién al hacer clic
+    (en otro hilo, sin bloquear la página) y queda en caché por formato y compresión.
+    La generación se mide como una etapa más del PipelineProfile del resultado
+    (ej: "CSV", "CSV (gzip)"), que se ve en Rendimiento en el rerun siguiente.
+    """
+    df_out, profile = result[0], result[-1]
+    name = f"{prefix}Archivo completo"
+    file_name = export_file_name(name, export_format, compression)
+    mime = COMPRESSIONS[compression][1] or EXPORT_FORMATS[export_format][1]
+    stage_name = export_format if compression == "Sin comprimir" else f"{export_format} ({compression})"
+
+    def export():
+        with profile.stage(stage_name, rows=len(df_out)) as stage:
+            data = export_bytes(df_out, sep, has_header, export_format, compression, name=name)
+            stage["bytes"] = len(data)
+        return data
+
+    def generate():
+        return cache.get_or_compute(("completo", export_format, compression) + process_key, export)
+
+    st.download_button(
+        f"Descargar {file_name}",
+        data=generate,
+        file_name=file_name,
+        mime=mime,
+        key=key,
+    )
+
+
+@st.cache_resource
+def get_store_executor() -> ThreadPoolExecutor:
+    """Un solo hilo para el almacén local: SQLite admite un escritor a la vez."""
+    return ThreadPoolExecutor(max_workers=1)
+
+
+def store_in_background(
+    cache: ResultCache, process_key: tuple, df_out: pd.DataFrame, name: str, start: bool = True
+) -> None:
+    """
+    Guarda el Archivo completo en el almacén local (ver store.py) una vez por resultado, en
+    segundo plano: la página no espera y un rerun no corta la escritura. Con start=False
+    solo muestra el estado de un guardado ya lanzado (se guarda al presionar Procesar, no al
+    marcar la opción después ni en cada rerun: un archivo borrado del almacén no vuelve solo).
+    """
+    from store import save_result  # store importa app: import diferido
+
+    key = ("store", name) + process_key
+    future = cache.get(key)
+    if future is None:
+        if not start:
+            return
+        future = get_store_executor().submit(save_result, df_out, name, process_key[0])
+        cache.put(key, future)
+    if not future.done():
+        st.caption(f"Guardando \"{name}\" en el almacén local en segundo plano...")
+    elif future.exception() is not None:
+        st.warning(f"No se pudo guardar \"{name}\" en el almacén local: {future.exception()}")
+    else:
+        st.caption(f"\"{name}\" guardado en el almacén local ({future.result()} filas).")
+
+
+def show_store_lookup() -> None:
+    """Filas guardadas en el almacén local para una lista de BOL (col C) o Shipment ID (col A)."""
+    from store import delete_file, list_files, lookup
+
+    files = list_files()
+    if files.empty:
+        st.caption("Todavía no hay resultados guardados: procesa un archivo con la opción de almacén activada.")
+        return
+    with st.expander(f"Archivos guardados ({len(files)})"):
+        st.dataframe(files, hide_index=True, width="stretch")
+
+    by = st.radio("Buscar por", options=["BOL (col C)", "Shipment ID (col A)"], horizontal=True)
+    # Por fila y no por nombre: puede haber varios "export.csv" con distinto contenido
+    choice = st.selectbox(
+        "Archivo",
+        options=[None] + list(range(len(files))),
+        format_func=lambda i: "Todos" if i is None else f"{files['nombre'][i]} ({files['guardado'][i]})",
+    )
+    if choice is not None and st.button("Borrar este archivo del almacén"):
+        delete_file(files["id"][choice])
+        # Que presionar Procesar de nuevo con el mismo archivo lo vuelva a guardar (ver store_in_background)
+        get_result_cache().discard(("store", files["nombre"][choice], files["sha256"][choice]))
+        st.rerun()
+    text = st.text_area("Valores (uno por línea, o separados por coma o punto y coma)")
+    values = text.replace(",", "\n").replace(";", "\n").splitlines()
+    if not any(v.strip() for v in values):
+        return
+
+    found = lookup(
+        "bol" if by.startswith("BOL") else "shipment_id",
+        values,
+        nombre=None if choice is None else files["nombre"][choice],
+        # Guardados de antes de la versión 2 del almacén no tienen sha256: se filtran solo por nombre
+        sha256=None if choice is None or pd.isna(files["sha256"][choice]) else files["sha256"][choice],
+    )
+    st.caption(f"{len(found)} filas encontradas.")
+    st.dataframe(found, hide_index=True, width="stretch")
+
+
+def main():
+    st.set_page_config(page_title="Reporte CSV", layout="wide")
+    st.title("Reporte CSV: Tabla Resumen + Archivo completo")
+
+    report_tab, lookup_tab = st.tabs(["Reporte", "Buscar en resultados guardados"])
+    with lookup_tab:
+        show_store_lookup()
+
+    with report_tab:
+        uploads = st.file_uploader("Sube tu archivo CSV (o varios)", type=["csv"], accept_multiple_files=True)
+        has_header = st.checkbox("Mi archivo tiene encabezados (header)", value=True)
+
+        if not uploads:
+            return
+        if len(uploads) == 1:
+            show_single_file(uploads[0], has_header)
+        else:
+            show_multiple_files(uploads, has_header)
+
+
+# `streamlit run app.py` ejecuta el script como __main__; `import app` no arma la UI.
+# Los procesos spawn (parallel.py) re-ejecutan este archivo como __mp_main__: la UI va solo acá.
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Benchmark del pipeline con exportes sintéticos (reproducibles por semilla).
+
+Uso:
+    python bench.py --sizes 10k 100k 1M 5M --save bench_baseline.json
+    python bench.py --sizes 10k 100k --compare bench_baseline.json --threshold 1.25
+
+Por tamaño y formato de fecha (MDY / DMY) mide cada etapa de app.process (las de
+app.run_pipeline y la Tabla Resumen): tiempo (mejor de --repeat) y pico de memoria
+(tracemalloc, en una pasada aparte para no inflar los tiempos).
+
+Con --compare termina con código 1 si alguna etapa empeora más que --threshold
+(tiempo o memoria) respecto de la línea base.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from app import (
+    COMPACT_INPUT_COLUMNS,
+    build_summary_counts,
+    compact_dtypes,
+    pipeline_copy,
+    repeated_text_columns,
+    run_pipeline,
+)
+
+DEFAULT_SIZES = ["10k", "100k", "1M", "5M"]
+DEFAULT_THRESHOLD = 1.25
+MIN_SECONDS = 0.05   # diferencias menores se consideran ruido
+MIN_PEAK_MB = 5.0
+
+HEADER = [
+    "Shipment ID", "Shipment type", "BOL", "Origin", "Destination", "Carrier",
+    "Estimated arrival", "Actual arrival", "Status",
+    "DIFERENCIA", "Min", "Max", "Diferencia", "Valor priorizado", "RANGO DIFERENCIA",
+]
+DATE_FORMATS = {"MDY": "%m/%d/%Y %H:%M", "DMY": "%d/%m/%Y %H:%M"}
+MINUTES_PER_YEAR = 365 * 24 * 60
+
+
+def parse_size(text: str) -> int:
+    """ "10k" -> 10000, "5M" -> 5000000."""
+    text = text.strip().lower()
+    factor = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * factor)
+
+
+def generate_export(
+    n_rows: int,
+    seed: int = 0,
+    date_format: str = "MDY",
+    containers_per_bol: tuple[int, int] = (1, 5),
+    blank_rate: float = 0.10,
+    no_valido_rate: float = 0.03,
+    bol_without_dates_rate: float = 0.40,
+) -> pd.DataFrame:
+    """
+    Exporte sintético con A..O, como lo devuelve read_csv_text (texto, NaN en blancos):
+    cada BOL es una fila BILL_OF_LADING seguida de sus CONTAINER (mismo C).
+    - containers_per_bol: rango (inclusive) de contenedores por BOL
+    - blank_rate / no_valido_rate: proporción de G/H en blanco / "No Valido"
+    - bol_without_dates_rate: filas BOL sin G ni H (N se completa desde contenedores)
+    """
+    rng = np.random.default_rng(seed)
+    lo, hi = containers_per_bol
+
+    sizes = 1 + rng.integers(lo, hi + 1, size=max(1, n_rows))
+    n_bols = int(np.searchsorted(np.cumsum(sizes), n_rows)) + 1
+    bol_of_row = np.repeat(np.arange(n_bols), sizes[:n_bols])[:n_rows]
+    is_bol_row = np.r_[True, bol_of_row[1:] != bol_of_row[:-1]][:n_rows]
+
+    # Fechas: una tabla de strings por minuto del año (strftime una sola vez por valor)
+    minutes = pd.date_range("2024-01-01", periods=MINUTES_PER_YEAR, freq="min")
+    table = np.asarray(minutes.strftime(DATE_FORMATS[date_format]), dtype=object)
+    t0 = rng.integers(0, MINUTES_PER_YEAR - 10_000, size=n_bols)[bol_of_row]
+    g_min = t0 + rng.integers(0, 4_000, size=n_rows)
+    h_min = np.clip(g_min + rng.integers(-1_440, 4_320, size=n_rows), 0, MINUTES_PER_YEAR - 1)
+
+    def with_invalid(values: np.ndarray) -> np.ndarray:
+        r = rng.random(n_rows)
+        values = values.copy()
+        values[r < blank_rate] = None
+        nv = (r >= blank_rate) & (r < blank_rate + no_valido_rate)
+        values[nv] = rng.choice(np.array(["No Valido", "no válido", " NO VALIDO "], dtype=object), size=int(nv.sum()))
+        return values
+
+    g = with_invalid(table[g_min])
+    h = with_invalid(table[h_min])
+    no_dates = is_bol_row & (rng.random(n_rows) < bol_without_dates_rate)
+    g[no_dates] = None
+    h[no_dates] = None
+
+    types = np.where(
+        is_bol_row,
+        rng.choice(np.array(["BILL_OF_LADING", "Bill of Lading"], dtype=object), size=n_rows),
+        rng.choice(np.array(["CONTAINER", "Container"], dtype=object), size=n_rows),
+    )
+    keys = np.asarray("BL" + pd.Series(np.arange(n_bols)).astype(str).str.zfill(8), dtype=object)[bol_of_row]
+    keys[rng.random(n_rows) < 0.01] = None
+    ids = np.asarray("S" + pd.Series(np.arange(n_rows)).astype(str).str.zfill(9), dtype=object)
+    empty = np.full(n_rows, None, dtype=object)
+
+    columns = [
+        ids, types, keys,
+        np.full(n_rows, "CLSAI", dtype=object), np.full(n_rows, "CNSHA", dtype=object), np.full(n_rows, "MSC", dtype=object),
+        g, h, empty, empty, empty, empty, empty, empty, empty,
+    ]
+    return pd.DataFrame({name: pd.Series(col, dtype=str) for name, col in zip(HEADER, columns)})
+
+
+def run_stages(df: pd.DataFrame, date_mode: str, stage) -> None:
+    """Mismas etapas que app.process; `stage(name)` es el context manager que mide cada una."""
+    df_out, _, rows = run_pipeline(pipeline_copy(df), date_mode, stage=stage)
+    with stage("Tabla Resumen"):
+        build_summary_counts(df_out, rows=rows)
+
+
+def time_stages(df: pd.DataFrame, date_mode: str) -> dict:
+    seconds = {}
+
+    @contextmanager
+    def stage(name):
+        start = time.perf_counter()
+        yield {}
+        seconds[name] = time.perf_counter() - start
+
+    run_stages(df, date_mode, stage)
+    return seconds
+
+
+def peak_memory_stages(df: pd.DataFrame, date_mode: str) -> dict:
+    peaks = {}
+
+    @contextmanager
+    def stage(name):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        yield {}
+        peaks[name] = (tracemalloc.get_traced_memory()[1] - base) / 1024 ** 2
+
+    tracemalloc.start()
+    try:
+        run_stages(df, date_mode, stage)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def bench_case(n_rows: int, date_format: str, seed: int, repeat: int, memory: bool) -> dict:
+    df = generate_export(n_rows, seed=seed, date_format=date_format)
+    df = compact_dtypes(df, COMPACT_INPUT_COLUMNS + repeated_text_columns(df), copy=False)  # como read_csv_text
+
+    runs = [time_stages(df, date_format) for _ in range(max(1, repeat))]
+    peaks = peak_memory_stages(df, date_format) if memory else {}
+
+    stages = {}
+    for name in runs[0]:
+        stages[name] = {"seconds": round(min(run[name] for run in runs), 4)}
+        if name in peaks:
+            stages[name]["peak_mb"] = round(peaks[name], 2)
+    return {
+        "rows": n_rows,
+        "date_format": date_format,
+        "total_seconds": round(sum(stage["seconds"] for stage in stages.values()), 4),
+        "stages": stages,
+    }
+
+
+def find_regressions(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Etapas que empeoran más que `threshold` (x veces) respecto de la línea base."""
+    regressions = []
+    for case, current in results.items():
+        base_case = baseline.get("results", {}).get(case)
+        if base_case is None:
+            continue
+        for stage, values in current["stages"].items():
+            base = base_case["stages"].get(stage)
+            if base is None:
+                continue
+            for metric, floor in (("seconds", MIN_SECONDS), ("peak_mb", MIN_PEAK_MB)):
+                if metric not in values or metric not in base:
+                    continue
+                if values[metric] > base[metric] * threshold and values[metric] - base[metric] > floor:
+                    regressions.append(f"{case} {stage} {metric}: {base[metric]} -> {values[metric]}")
+    return regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark por etapa del pipeline con exportes sintéticos.")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="Filas por caso (ej: 10k 1M)")
+    parser.add_argument("--date-formats", nargs="+", choices=sorted(DATE_FORMATS), default=["MDY", "DMY"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="Repeticiones por caso (se guarda la mejor)")
+    parser.add_argument("--no-memory", action="store_true", help="No medir pico de memoria (más rápido)")
+    parser.add_argument("--save", help="Guardar resultados como línea base JSON")
+    parser.add_argument("--compare", help="Línea base JSON contra la cual comparar")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Empeoramiento tolerado (x veces)")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    results = {}
+    for size in args.sizes:
+        n_rows = parse_size(size)
+        for date_format in args.date_formats:
+            case = f"{size}/{date_format}"
+            results[case] = bench_case(n_rows, date_format, args.seed, args.repeat, memory=not args.no_memory)
+            print(f"{case}: {results[case]['total_seconds']:.2f} s")
+            for stage, values in results[case]["stages"].items():
+                peak = f"  {values['peak_mb']:.1f} MB" if "peak_mb" in values else ""
+                print(f"    {stage:<40} {values['seconds']:8.3f} s{peak}")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESIÓN {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""
+Procesamiento por lotes sin navegador (mismo pipeline que la app Streamlit).
+
+Uso:
+    python cli.py exportes/*.csv --out-dir salida --date-mode AUTO --jobs 8
+
+Por cada archivo de entrada escribe en --out-dir:
+    "<nombre> - Archivo completo.csv" y "<nombre> - Tabla Resumen.csv"
+Si varias entradas tienen el mismo nombre (ej: a/export.csv y b/export.csv), desde la
+segunda llevan un sufijo: "export (2) - Archivo completo.csv".
+
+Con --stream el archivo se procesa por bloques en dos pasadas (ver streaming.py),
+para CSV que no caben en memoria.
+
+Con --format parquet|feather el Archivo completo se escribe en ese formato (requiere
+pyarrow); --arrow lee los CSV con el lector multihilo de pyarrow. Con --compress gzip|zip
+se escribe comprimido ("... .csv.gz" / "... .zip").
+
+Con --workers N cada archivo se procesa con el motor paralelo (ver parallel.py): las filas
+se reparten por BOL entre N procesos.
+
+Con --state-dir se procesa en modo incremental (ver incremental.py): solo se recalculan
+los BOL que cambiaron desde la corrida anterior guardada en esa carpeta.
+
+Con --store cada Archivo completo se guarda además en el almacén local SQLite (ver store.py),
+indexado por BOL (col C) y Shipment ID (col A). Con --jobs los archivos se procesan en
+paralelo pero los guarda el proceso principal, de a uno: SQLite admite un escritor a la vez.
+"""
+import argparse
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from app import (
+    EXPORT_FORMATS,
+    decode_csv_bytes,
+    export_file_name,
+    file_sha256,
+    read_csv_bytes,
+    sniff_delimiter,
+    to_csv_bytes,
+    write_export,
+)
+from incremental import process_incremental
+from parallel import process_parallel
+from store import save_result
+from streaming import DEFAULT_CHUNKSIZE, process_streaming
+
+
+def output_stems(inputs: list) -> list[str]:
+    """Nombre de salida de cada entrada: su nombre sin extensión, con " (2)", " (3)"... si se repite."""
+    stems = [Path(path).stem for path in inputs]
+    # casefold: en Windows/macOS "Export" y "export" son el mismo archivo
+    taken = {stem.casefold() for stem in stems}
+    seen = set()
+    out = []
+    for stem in stems:
+        name = stem
+        if stem.casefold() in seen:
+            i = 2
+            while f"{stem} ({i})".casefold() in taken:
+                i += 1
+            name = f"{stem} ({i})"
+            taken.add(name.casefold())
+        seen.add(stem.casefold())
+        out.append(name)
+    return out
+
+
+def output_paths(
+    input_path: Path,
+    out_dir: Path,
+    export_format: str = "CSV",
+    compression: str = "Sin comprimir",
+    stem: str = None,
+) -> tuple[Path, Path]:
+    stem = stem or input_path.stem
+    full_name = export_file_name(f"{stem} - Archivo completo", export_format, compression)
+    return out_dir / full_name, out_dir / f"{stem} - Tabla Resumen.csv"
+
+
+def process_file(input_path: str, out_dir: str, store: str = None, **kwargs) -> str:
+    """
+    Procesa un CSV, escribe sus dos salidas (ver write_outputs) y con `store` guarda el
+    Archivo completo en ese almacén. Devuelve un resumen de una línea.
+    """
+    message, df_out, sha256 = write_outputs(input_path, out_dir, **kwargs)
+    if store:
+        message += store_output(df_out, input_path, sha256, store)
+    return message
+
+
+def store_output(df_out, input_path: str, sha256: str, store: str) -> str:
+    """Guarda el Archivo completo en el almacén `store`; devuelve la nota para el resumen."""
+    save_result(df_out, Path(input_path).name, sha256, path=store)
+    return f", guardado en {store}"
+
+
+def write_outputs(
+    input_path: str,
+    out_dir: str,
+    date_mode: str = "AUTO",
+    sep: str = None,
+    has_header: bool = True,
+    stream: bool = False,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    export_format: str = "CSV",
+    arrow: bool = False,
+    state_dir: str = None,
+    compression: str = "Sin comprimir",
+    workers: int = 1,
+    stem: str = None,
+) -> tuple:
+    """
+    Procesa un CSV y escribe sus dos salidas (con `stem` como nombre, ver output_stems).
+    Devuelve (resumen de una línea, Archivo completo, sha256 del CSV); con --stream los dos
+    últimos son None (el Archivo completo no queda en memoria).
+    """
+    input_path = Path(input_path)
+    out_dir = Path(out_dir)
+    stem = stem or input_path.stem
+    full_path, summary_path = output_paths(input_path, out_dir, export_format, compression, stem=stem)
+
+    if stream:
+        resumen = process_streaming(
+            input_path, full_path, date_mode=date_mode, sep=sep, has_header=has_header, chunksize=chunksize
+        )
+        summary_path.write_bytes(to_csv_bytes(resumen, sep=",", include_header=True))
+        return f"{input_path} -> {full_path.name} (streaming)", None, None
+
+    raw = input_path.read_bytes()
+    sep = sep or sniff_delimiter(decode_csv_bytes(raw[:65536]))
+
+    df = read_csv_bytes(raw, sep=sep, has_header=has_header, arrow=arrow)
+    note = ""
+    if state_dir:
+        df_out, resumen, stats = process_incremental(df, date_mode, state_dir)
+        note = f", {stats['bols_recalculados']} de {stats['bols']} BOL recalculados"
+    else:
+        df_out, resumen = process_parallel(df, date_mode, workers=workers)
+
+    # Directo al archivo, por bloques: no se arma el CSV completo en memoria
+    with open(full_path, "wb") as f:
+        write_export(
+            df_out, f, sep, has_header, export_format, compression, name=f"{stem} - Archivo completo"
+        )
+    summary_path.write_bytes(to_csv_bytes(resumen, sep=",", include_header=True))
+    return f"{input_path} -> {full_path.name} ({len(df_out)} filas{note})", df_out, file_sha256(raw)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Genera Archivo completo y Tabla Resumen para uno o más CSV.")
+    parser.add_argument("inputs", nargs="+", help="CSV de entrada")
+    parser.add_argument("--out-dir", default=".", help="Carpeta de salida (default: actual)")
+    parser.add_argument("--date-mode", choices=["AUTO", "MDY", "DMY"], default="AUTO")
+    parser.add_argument("--sep", default=None, help="Delimitador (default: detectado por archivo)")
+    parser.add_argument("--no-header", action="store_true", help="Los CSV no traen encabezados")
+    parser.add_argument("--jobs", type=int, default=1, help="Archivos en paralelo (default: 1)")
+    parser.add_argument("--workers", type=int, default=1, help="Procesos por archivo, repartidos por BOL (default: 1)")
+    parser.add_argument("--stream", action="store_true", help="Procesar por bloques (CSV más grandes que la memoria)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Filas por bloque con --stream")
+    parser.add_argument(
+        "--format", choices=[f.lower() for f in EXPORT_FORMATS], default="csv", help="Formato del Archivo completo"
+    )
+    parser.add_argument("--compress", choices=["gzip", "zip"], help="Comprimir el Archivo completo")
+    parser.add_argument("--arrow", action="store_true", help="Leer los CSV con pyarrow (multihilo)")
+    parser.add_argument("--state-dir", help="Modo incremental: carpeta con el estado por BOL de la corrida anterior")
+    parser.add_argument("--store", help="Guardar cada Archivo completo en este almacén SQLite (búsqueda por BOL)")
+    return parser
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    export_format = {f.lower(): f for f in EXPORT_FORMATS}[args.format]
+    if args.stream and (export_format != "CSV" or args.compress):
+        parser.error("--stream solo escribe CSV sin comprimir")
+    if args.state_dir and (args.stream or args.jobs > 1):
+        parser.error("--state-dir no se combina con --stream ni con --jobs (los archivos se procesan en orden)")
+    if args.workers > 1 and (args.stream or args.state_dir):
+        parser.error("--workers no se combina con --stream ni con --state-dir")
+    if args.store and args.stream:
+        parser.error("--store no se combina con --stream (el Archivo completo no queda en memoria)")
+    Path(args.out_dir).mkdir(parents=True, exist_ok=True)
+
+    kwargs = dict(
+        out_dir=args.out_dir,
+        date_mode=args.date_mode,
+        sep=args.sep,
+        has_header=not args.no_header,
+        stream=args.stream,
+        chunksize=args.chunksize,
+        export_format=export_format,
+        arrow=args.arrow,
+        state_dir=args.state_dir,
+        compression=args.compress or "Sin comprimir",
+        workers=args.workers,
+    )
+    failed = 0
+    stems = output_stems(args.inputs)
+
+    if args.jobs > 1 and len(args.inputs) > 1:
+        # Con --store los procesos solo escriben sus salidas y devuelven el Archivo completo: el
+        # almacén lo escribe este proceso, de a un archivo a medida que terminan (varios
+        # escritores a la vez esperarían el bloqueo de SQLite)
+        job = write_outputs if args.store else process_file
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            futures = {pool.submit(job, path, stem=stem, **kwargs): path for path, stem in zip(args.inputs, stems)}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    if args.store:
+                        message, df_out, sha256 = future.result()
+                        message += store_output(df_out, path, sha256, args.store)
+                    else:
+                        message = future.result()
+                    print(message)
+                except Exception as e:
+                    failed += 1
+                    print(f"ERROR {path}: {e}", file=sys.stderr)
+    else:
+        for path, stem in zip(args.inputs, stems):
+            try:
+                print(process_file(path, stem=stem, store=args.store, **kwargs))
+            except Exception as e:
+                failed += 1
+                print(f"ERROR {path}: {e}", file=sys.stderr)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,372 @@
+"""
+Prueba diferencial: motor de referencia (reference.py, las funciones fila a fila
+originales) contra los motores rápidos, celda por celda en N/K/L/J/O y en la Tabla Resumen.
+
+Uso:
+    python difftest.py --sizes 10k
+    python difftest.py --sizes 1M --generators sintetico --engines vectorizado paralelo --cache-dir difftest_cache
+
+Por tamaño y semilla genera exportes:
+- sintetico: bench.generate_export (MDY / DMY)
+- fuzz: fuzz_export, con blancos, variantes de "No Valido", texto basura, empates,
+  diferencias de 0 / 24 hrs / negativas, C con espacios, A repetidas, BOL sin
+  contenedores, contenedores sin fila BOL y filas de otro tipo (MDY / DMY / ISO)
+- fuzz-1C: fuzz_export con un único valor en C ("1 único C")
+- fuzz-formatos: fuzz_export con algunos BOL en otro formato de fecha (ej: "01-05-2024 10:00",
+  "Jan 05 2024 10:00"), que los motores parsean por inferencia valor por valor. La
+  referencia infiere un solo formato por columna (el del primer valor) al calcular J y N
+  desde contenedores, así que en este caso corre por separado sobre las filas de cada formato
+
+Los motores corren en AUTO y en el modo de los datos; la referencia, siempre en el modo de
+los datos. Su AUTO no sirve de referencia: decide MDY/DMY por grupo de BOL y, si el grupo
+empieza con un valor que no es fecha, pandas infiere cada valor por separado (ej:
+"12/05/2024" como diciembre en datos DMY); los motores deciden una vez por archivo (ver
+DateStore). Con un modo que no calza con los datos los resultados también difieren por
+diseño, así que esos casos no se prueban.
+
+Los motores leen el CSV como la app (read_csv_bytes) y la referencia como el app.py
+original; los tiempos no incluyen la lectura, salvo en streaming (que lee y escribe por
+bloques). En incremental se mide la segunda corrida, sobre un estado guardado de una
+versión anterior del mismo exporte.
+
+La referencia tarda ~1 s cada 1.000 filas: con --cache-dir su resultado se guarda por
+contenido del CSV, modo y versión de reference.py, y las corridas siguientes solo miden
+los motores. Termina con código 1 si algún motor difiere de la referencia.
+"""
+import argparse
+import hashlib
+import pickle
+import sys
+import tempfile
+import time
+import warnings
+from io import BytesIO
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import reference
+from app import (
+    IDX_A_SHIPMENT_ID,
+    IDX_B_SHIPMENT_TYPE,
+    IDX_C_BOL,
+    IDX_G_ESTIMATED,
+    IDX_H_ACTUAL,
+    IDX_J_DIFF_HOURS,
+    IDX_K_MIN,
+    IDX_L_MAX,
+    IDX_N_PRIORITIZED,
+    IDX_O_RANGE,
+    pa,
+    process,
+    read_csv_bytes,
+    to_display_frame,
+)
+from bench import HEADER, generate_export, parse_size
+from incremental import process_incremental
+from parallel import process_parallel
+from streaming import process_streaming
+
+OUTPUT_COLUMNS = [IDX_N_PRIORITIZED, IDX_K_MIN, IDX_L_MAX, IDX_J_DIFF_HOURS, IDX_O_RANGE]
+OUTPUT_NAMES = ["N", "K", "L", "J", "O"]
+FUZZ_FORMATS = {"MDY": "%m/%d/%Y %H:%M", "DMY": "%d/%m/%Y %H:%M", "ISO": "%Y-%m-%d %H:%M:%S"}
+DATA_MODES = {"MDY": "MDY", "DMY": "DMY", "ISO": "MDY"}  # modo de la referencia por formato de los datos
+# Formatos alternativos por formato de los datos (fuzz-formatos). Sin ISO en DMY: la referencia
+# lee "2024-01-04" con dayfirst=True como 1 de abril
+FUZZ_MIXED_FORMATS = {
+    "MDY": ["%m-%d-%Y %H:%M", "%b %d %Y %H:%M", "%Y-%m-%d %H:%M:%S"],
+    "DMY": ["%d-%m-%Y %H:%M", "%d %b %Y %H:%M"],
+    "ISO": ["%m/%d/%Y %H:%M", "%b %d %Y %H:%M"],
+}
+FUZZ_MIXED_RATE = 0.15  # BOL en un formato alternativo
+GENERATORS = ["sintetico", "fuzz", "fuzz-1C", "fuzz-formatos"]
+MAX_DETAIL_ROWS = 5
+
+
+def fuzz_export(
+    n_rows: int, seed: int = 0, date_format: str = "MDY", single_key: bool = False, mixed_formats: bool = False
+) -> pd.DataFrame:
+    """
+    Exporte A..O con los casos borde de la referencia (ver docstring del módulo).
+    Con mixed_formats, df.attrs["formato"] tiene el formato de cada fila (0 = date_format).
+    """
+    rng = np.random.default_rng(seed)
+    sizes = 1 + rng.integers(0, 6, size=max(1, n_rows))  # fila BOL + 0..5 contenedores
+    n_groups = int(np.searchsorted(np.cumsum(sizes), n_rows)) + 1
+    group = np.repeat(np.arange(n_groups), sizes[:n_groups])[:n_rows]
+    first = np.r_[True, group[1:] != group[:-1]][:n_rows]
+
+    def pick(options, size):
+        return rng.choice(np.array(options, dtype=object), size=size)
+
+    def some(rate):
+        return rng.random(n_rows) < rate
+
+    # B: variantes de BOL / CONTAINER; algunos grupos sin fila BOL y algunas filas de otro tipo
+    types = np.where(
+        first & ~some(0.03),
+        pick(["BILL_OF_LADING", "Bill of Lading", " bill_of_lading "], n_rows),
+        pick(["CONTAINER", "container", " Container "], n_rows),
+    )
+    other = some(0.01)
+    types[other] = pick(["OTHER", "", " ", None], int(other.sum()))
+
+    # C: clave por grupo (o una sola), con espacios y blancos
+    if single_key:
+        keys = np.full(n_rows, "BOL0000001", dtype=object)
+    else:
+        keys = np.asarray("BOL" + pd.Series(group).astype(str).str.zfill(7), dtype=object)
+    padded = some(0.05)
+    keys[padded] = " " + keys[padded] + " "
+    blank_group = (rng.random(n_groups) < 0.02)[group]
+    keys[blank_group] = pick(["", " ", None, "nan"], int(blank_group.sum()))
+
+    # A: única por fila salvo BOL repetidas (cuentan una vez) y algunos blancos
+    ids = np.asarray("S" + pd.Series(np.arange(n_rows)).astype(str).str.zfill(9), dtype=object)
+    repeated = np.flatnonzero(first & some(0.04))
+    ids[repeated[1:]] = ids[repeated[:-1]]
+    ids[some(0.01)] = None
+
+    # G/H en minutos: empates dentro del grupo y diferencias de 0, 24 hrs, 24 hrs + 1 min y negativas
+    t0 = rng.integers(0, 360 * 24 * 60, size=n_groups)[group]
+    g_min = t0 + np.where(some(0.3), 0, rng.integers(0, 4_000, size=n_rows))
+    delta = np.select(
+        [some(0.1), some(0.1), some(0.05), some(0.1)],
+        [0, 1_440, 1_441, -rng.integers(1, 600, size=n_rows)],
+        default=rng.integers(1, 4_320, size=n_rows),
+    )
+    h_min = np.clip(g_min + delta, 0, None)
+    minutes, codes = np.unique(np.r_[g_min, h_min], return_inverse=True)
+    stamps = pd.Timestamp("2024-01-01") + pd.to_timedelta(minutes, unit="min")
+    formats = [FUZZ_FORMATS[date_format]] + (FUZZ_MIXED_FORMATS[date_format] if mixed_formats else [])
+    texts = np.array([np.asarray(stamps.strftime(fmt), dtype=object) for fmt in formats], dtype=object)
+    # Todas las fechas de un BOL en el mismo formato
+    row_format = np.zeros(n_rows, dtype=np.int64)
+    if mixed_formats:
+        alternative = rng.random(n_groups) < FUZZ_MIXED_RATE
+        per_group = np.where(alternative, rng.integers(1, len(formats), size=n_groups), 0)
+        row_format = per_group[group]
+
+    def with_noise(values):
+        values = values.copy()
+        r = rng.random(n_rows)
+        values[r < 0.08] = pick(["", " ", None], int((r < 0.08).sum()))
+        nv = (r >= 0.08) & (r < 0.12)
+        values[nv] = pick(["No Valido", "no válido", " NO VALIDO ", "No Valido - sin dato"], int(nv.sum()))
+        # Sin texto basura en fuzz-formatos: si el primer valor fuera del formato detectado no
+        # es fecha, pandas ya infiere valor por valor y el caso no prueba nada
+        bad = (r >= 0.12) & (r < (0.12 if mixed_formats else 0.13))
+        values[bad] = pick(["garbage", "31/31/2024 10:00", "2024-13-45"], int(bad.sum()))
+        return values
+
+    g = with_noise(texts[row_format, codes[:n_rows]])
+    h = with_noise(texts[row_format, codes[n_rows:]])
+    no_dates = first & some(0.3)
+    g[no_dates] = None
+    h[no_dates] = None
+
+    # K/L de entrada: se conservan en filas que no son BOL ni CONTAINER
+    k = np.where(other, g, None)
+    l = np.where(other, h, None)
+    empty = np.full(n_rows, None, dtype=object)
+    columns = [
+        ids, types, keys,
+        np.full(n_rows, "CLSAI", dtype=object), np.full(n_rows, "CNSHA", dtype=object), np.full(n_rows, "MSC", dtype=object),
+        g, h, empty, empty, k, l, empty, empty, empty,
+    ]
+    df = pd.DataFrame({name: pd.Series(col, dtype=object) for name, col in zip(HEADER, columns)})
+    if mixed_formats:
+        df.attrs["formato"] = row_format
+    return df
+
+
+def generate_cases(sizes: list, seeds: int, generators: list):
+    """
+    (nombre, CSV en bytes, modo de los datos, particiones de la referencia) para cada
+    combinación pedida; particiones es None salvo en fuzz-formatos (formato de cada fila).
+    """
+    for size in sizes:
+        n_rows = parse_size(size)
+        for seed in range(seeds):
+            for generator in generators:
+                formats = ["MDY", "DMY"] if generator == "sintetico" else list(FUZZ_FORMATS)
+                for date_format in formats:
+                    if generator == "sintetico":
+                        df = generate_export(n_rows, seed=seed, date_format=date_format)
+                    else:
+                        df = fuzz_export(
+                            n_rows,
+                            seed=seed,
+                            date_format=date_format,
+                            single_key=generator == "fuzz-1C",
+                            mixed_formats=generator == "fuzz-formatos",
+                        )
+                    raw = df.to_csv(index=False).encode("utf-8")
+                    partitions = df.attrs.get("formato")
+                    yield f"{size}/{generator}/{date_format}/s{seed}", raw, DATA_MODES[date_format], partitions
+
+
+def output_cells(df_out: pd.DataFrame) -> np.ndarray:
+    """N/K/L/J/O como se exportan (blancos como "")."""
+    cells = to_display_frame(df_out).iloc[:, OUTPUT_COLUMNS].astype(object)
+    return cells.where(cells.notna(), "").astype(str).to_numpy()
+
+
+def run_reference(
+    raw: bytes, date_mode: str, cache_dir: Path = None, partitions: np.ndarray = None
+) -> tuple[np.ndarray, pd.DataFrame, float]:
+    """
+    (celdas, Tabla Resumen, segundos) de la referencia; desde --cache-dir si ya se calculó.
+    Con `partitions` corre por separado sobre cada grupo de filas y arma la Tabla Resumen
+    sobre el archivo completo (los BL únicos por col A se cuentan entre todos).
+    """
+    path = None
+    if cache_dir is not None:
+        version = hashlib.sha256(Path(reference.__file__).read_bytes()).hexdigest()[:12]
+        path = cache_dir / f"{hashlib.sha256(raw).hexdigest()[:16]}-{date_mode}-{version}.pkl"
+        if path.exists():
+            with open(path, "rb") as f:
+                return pickle.load(f)
+
+    # Lectura del app.py original
+    df = pd.read_csv(BytesIO(raw), dtype=str, keep_default_na=True)
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # avisos de inferencia de fechas de pandas, uno por grupo
+        if partitions is None:
+            df_out, resumen = reference.process_reference(df, date_mode)
+        else:
+            parts = [reference.process_reference(df[partitions == p], date_mode)[0] for p in np.unique(partitions)]
+            df_out = pd.concat(parts).sort_index()
+            resumen = reference.build_summary_counts(df_out)
+    result = (output_cells(df_out), resumen, time.perf_counter() - start)
+
+    if path is not None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            pickle.dump(result, f)
+    return result
+
+
+def run_vectorized(raw: bytes, date_mode: str, workdir: Path, workers: int):
+    df = read_csv_bytes(raw, sep=",", has_header=True)
+    start = time.perf_counter()
+    df_out, resumen = process(df, date_mode)
+    return df_out, resumen, time.perf_counter() - start
+
+
+def run_arrow(raw: bytes, date_mode: str, workdir: Path, workers: int):
+    df = read_csv_bytes(raw, sep=",", has_header=True, arrow=True)
+    start = time.perf_counter()
+    df_out, resumen = process(df, date_mode)
+    return df_out, resumen, time.perf_counter() - start
+
+
+def run_parallel(raw: bytes, date_mode: str, workdir: Path, workers: int):
+    df = read_csv_bytes(raw, sep=",", has_header=True)
+    start = time.perf_counter()
+    # min_rows=0: las particiones se prueban también en los casos chicos
+    df_out, resumen = process_parallel(df, date_mode, workers=workers, min_rows=0)
+    return df_out, resumen, time.perf_counter() - start
+
+
+def run_streaming(raw: bytes, date_mode: str, workdir: Path, workers: int):
+    input_path, output_path = workdir / "entrada.csv", workdir / "salida.csv"
+    input_path.write_bytes(raw)
+    n_rows = raw.count(b"\n")
+    start = time.perf_counter()
+    # Bloques chicos: los BOL quedan repartidos entre bloques
+    resumen = process_streaming(input_path, output_path, date_mode, sep=",", chunksize=max(1, n_rows // 5))
+    seconds = time.perf_counter() - start
+    df_out = pd.read_csv(output_path, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+    return df_out, resumen, seconds
+
+
+def run_incremental(raw: bytes, date_mode: str, workdir: Path, workers: int):
+    df = read_csv_bytes(raw, sep=",", has_header=True)
+    state_dir = workdir / "estado"
+    # Versión anterior del exporte: algunas G distintas => esos BOL se recalculan, el resto se reutiliza
+    previous = df.copy()
+    previous.isetitem(IDX_G_ESTIMATED, previous.iloc[:, IDX_G_ESTIMATED].astype(object).where(np.arange(len(df)) % 17 != 0))
+    process_incremental(previous, date_mode, state_dir)
+    start = time.perf_counter()
+    df_out, resumen, _ = process_incremental(df, date_mode, state_dir)
+    return df_out, resumen, time.perf_counter() - start
+
+
+ENGINES = {
+    "vectorizado": run_vectorized,
+    "paralelo": run_parallel,
+    "streaming": run_streaming,
+    "incremental": run_incremental,
+}
+if pa is not None:
+    ENGINES["arrow"] = run_arrow
+
+
+def mismatch_detail(raw: bytes, expected: np.ndarray, got: np.ndarray) -> pd.DataFrame:
+    """Primeras filas distintas: A/B/C/G/H de entrada, referencia y motor."""
+    rows = np.flatnonzero((expected != got).any(axis=1))[:MAX_DETAIL_ROWS]
+    source = pd.read_csv(BytesIO(raw), dtype=str, keep_default_na=True)
+    columns = [IDX_A_SHIPMENT_ID, IDX_B_SHIPMENT_TYPE, IDX_C_BOL, IDX_G_ESTIMATED, IDX_H_ACTUAL]
+    detail = source.iloc[rows, columns].set_axis(list("ABCGH"), axis=1)
+    for i, name in enumerate(OUTPUT_NAMES):
+        detail[f"{name} ref"] = expected[rows, i]
+        detail[f"{name} motor"] = got[rows, i]
+    return detail
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Compara los motores rápidos contra el motor de referencia.")
+    parser.add_argument("--sizes", nargs="+", default=["10k"], help="Filas por exporte (ej: 10k 1M)")
+    parser.add_argument("--seeds", type=int, default=1, help="Semillas por tamaño (0..N-1)")
+    parser.add_argument("--generators", nargs="+", choices=GENERATORS, default=GENERATORS)
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES), default=list(ENGINES))
+    parser.add_argument("--workers", type=int, default=2, help="Procesos del motor paralelo")
+    parser.add_argument("--cache-dir", help="Carpeta donde guardar/reusar los resultados de la referencia")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    cache_dir = Path(args.cache_dir) if args.cache_dir else None
+
+    report = []
+    failed = 0
+    for case, raw, data_mode, partitions in generate_cases(args.sizes, args.seeds, args.generators):
+        expected, expected_summary, ref_seconds = run_reference(raw, data_mode, cache_dir, partitions)
+        print(f"{case}: referencia {ref_seconds:.2f} s", flush=True)
+        for date_mode, engine in product(["AUTO", data_mode], args.engines):
+            with tempfile.TemporaryDirectory() as tmp:
+                df_out, resumen, seconds = ENGINES[engine](raw, date_mode, Path(tmp), args.workers)
+            got = output_cells(df_out)
+            diff = (expected != got).sum(axis=0) if got.shape == expected.shape else np.full(len(OUTPUT_NAMES), -1)
+            summary_ok = resumen.reset_index(drop=True).equals(expected_summary)
+            ok = not diff.any() and summary_ok
+            report.append({
+                "caso": case,
+                "modo": date_mode,
+                "motor": engine,
+                "filas": len(expected),
+                "segundos": round(seconds, 3),
+                "x referencia": round(ref_seconds / seconds, 1) if seconds else None,
+                **{f"dif {name}": int(d) for name, d in zip(OUTPUT_NAMES, diff)},
+                "resumen igual": summary_ok,
+            })
+            if not ok:
+                failed += 1
+                print(f"DIFERENCIA {case} {date_mode} {engine}", file=sys.stderr)
+                if got.shape == expected.shape and diff.any():
+                    print(mismatch_detail(raw, expected, got).to_string(), file=sys.stderr)
+                if not summary_ok:
+                    print(expected_summary.merge(resumen, on="indicador", suffixes=(" ref", " motor")), file=sys.stderr)
+
+    print(pd.DataFrame(report).to_string(index=False))
+    print(f"{len(report) - failed} de {len(report)} comparaciones iguales a la referencia")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""
+Modo incremental: reprocesa solo los BOL (col C) que cambiaron desde la última corrida
+(un BOL depende solo de sus filas y de dos decisiones de todo el archivo, dayfirst y
+"1 único C": ver app.run_pipeline). El estado guardado en `state_dir` tiene, por clave C:
+- huella de sus filas (hash, sensible al orden) y cantidad de filas
+- parseos MDY/DMY de G/H (para decidir AUTO sin volver a parsear las claves sin cambios)
+y, por fila, las columnas calculadas (J, K, L, N, O) de la corrida anterior.
+
+En una corrida nueva solo se recalculan las claves cuya huella cambió; el resto reutiliza
+J/K/L/N/O guardados. Si cambia una decisión de todo el archivo (dayfirst, 1 único C,
+encabezados o modo de fecha) se recalcula todo.
+"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app import (
+    IDX_G_ESTIMATED,
+    IDX_H_ACTUAL,
+    IDX_J_DIFF_HOURS,
+    IDX_K_MIN,
+    IDX_L_MAX,
+    IDX_N_PRIORITIZED,
+    IDX_O_RANGE,
+    DateStore,
+    RowIndex,
+    build_summary_counts,
+    clean_date_values,
+    run_pipeline,
+    take_codes,
+)
+
+STATE_VERSION = 2
+OUTPUT_COLUMNS = {"J": IDX_J_DIFF_HOURS, "K": IDX_K_MIN, "L": IDX_L_MAX, "N": IDX_N_PRIORITIZED, "O": IDX_O_RANGE}
+COUNT_COLUMNS = ["parsed_mdy", "parsed_dmy"]
+_POSITION_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def group_keys(rows: RowIndex) -> np.ndarray:
+    """Clave C limpia por fila ("" = en blanco; esas filas no dependen de otras)."""
+    return take_codes(rows.bol_keys, rows.bol_codes, fill="")
+
+
+def key_positions(keys: np.ndarray) -> np.ndarray:
+    """Posición de cada fila dentro de su clave (0, 1, 2...), en el orden del archivo."""
+    return pd.Series(keys).groupby(keys, sort=False).cumcount().to_numpy()
+
+
+def key_fingerprints(df: pd.DataFrame, keys: np.ndarray) -> pd.DataFrame:
+    """Por clave: huella de sus filas (sensible al orden) y cantidad de filas."""
+    row_hash = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    position = key_positions(keys).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        mixed = row_hash ^ ((position + np.uint64(1)) * _POSITION_MIX)
+    frame = pd.DataFrame({"key": keys, "hash": mixed})
+    return frame.groupby("key", sort=False).agg(hash=("hash", "sum"), rows=("hash", "size"))
+
+
+def load_state(state_dir: Path):
+    """(meta, bols, rows) de la corrida anterior, o None si no hay estado (o es de otra versión)."""
+    meta_path = state_dir / "meta.json"
+    if not meta_path.exists():
+        return None
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    if meta.get("version") != STATE_VERSION:
+        return None
+    return meta, pd.read_pickle(state_dir / "bols.pkl"), pd.read_pickle(state_dir / "rows.pkl")
+
+
+def save_state(state_dir: Path, meta: dict, bols: pd.DataFrame, rows: pd.DataFrame) -> None:
+    state_dir.mkdir(parents=True, exist_ok=True)
+    # Se escribe a temporales y se reemplaza al final: una corrida cortada no deja estado a medias
+    bols.to_pickle(state_dir / "bols.pkl.tmp")
+    rows.to_pickle(state_dir / "rows.pkl.tmp")
+    (state_dir / "meta.json.tmp").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    for name in ("bols.pkl", "rows.pkl", "meta.json"):
+        os.replace(state_dir / f"{name}.tmp", state_dir / name)
+
+
+def parse_counts_by_key(df: pd.DataFrame, keys: np.ndarray, dates: DateStore) -> pd.DataFrame:
+    """Por clave: cuántos G/H calzan con el formato MDY y con el DMY (para decidir AUTO)."""
+    values = clean_date_values(pd.concat([df.iloc[:, IDX_H_ACTUAL], df.iloc[:, IDX_G_ESTIMATED]], ignore_index=True))
+    both_keys = np.concatenate([keys, keys])
+    return pd.DataFrame({
+        "parsed_mdy": dates.parsed_mask(values, False).astype(np.int64),
+        "parsed_dmy": dates.parsed_mask(values, True).astype(np.int64),
+    }).groupby(both_keys, sort=False).sum()
+
+
+def process_keys(df: pd.DataFrame, date_mode: str, dayfirst: bool, single_key: bool, formats: dict):
+    """
+    Mismas etapas que app.process sobre las filas de algunas claves, con dayfirst,
+    "1 único C" y formatos de fecha fijados para todo el archivo.
+    Devuelve (frame procesado, formatos de fecha usados).
+    """
+    dates = DateStore.from_frame(df, date_mode, dayfirst=dayfirst, formats=formats)
+    df_out, dates, _ = run_pipeline(df, date_mode, dates=dates, single_key=single_key)
+    return df_out, dates.formats
+
+
+def process_incremental(df: pd.DataFrame, date_mode: str, state_dir) -> tuple[pd.DataFrame, pd.DataFrame, dict]:
+    """
+    Como app.process, reutilizando el estado de `state_dir` para los BOL sin cambios.
+    Devuelve (Archivo completo, Tabla Resumen, estadísticas) y actualiza el estado.
+    """
+    state_dir = Path(state_dir)
+    rows = RowIndex(df)
+    keys = group_keys(rows)
+    prints = key_fingerprints(df, keys)
+    all_keys = prints.index.to_numpy()
+    columns = [str(c) for c in df.columns]
+
+    state = load_state(state_dir)
+    if state is not None and (state[0]["date_mode"] != date_mode or state[0]["columns"] != columns):
+        state = None
+
+    if state is None:
+        dates = DateStore(date_mode)
+        changed = all_keys
+    else:
+        meta, prev_bols, prev_rows = state
+        dates = DateStore(date_mode, formats={k == "True": fmt for k, fmt in meta["formats"].items()})
+        # fill_value mantiene el hash en uint64 (con NaN pasaría a float y perdería bits)
+        prev_hash = prev_bols["hash"].reindex(prints.index, fill_value=0).to_numpy()
+        prev_count = prev_bols["rows"].reindex(prints.index, fill_value=0).to_numpy()
+        same = (prev_hash == prints["hash"].to_numpy()) & (prev_count == prints["rows"].to_numpy())
+        changed = all_keys[~same]
+    changed_pos = np.flatnonzero(pd.Index(changed).get_indexer(keys) >= 0)
+
+    # AUTO: parseos por clave, calculados solo para las claves que cambiaron
+    if date_mode == "AUTO":
+        counts = parse_counts_by_key(df.iloc[changed_pos], keys[changed_pos], dates)
+        if state is not None:
+            kept = prev_bols[COUNT_COLUMNS].reindex(prints.index.difference(changed))
+            counts = pd.concat([kept, counts])
+        dates.dayfirst = bool(counts["parsed_dmy"].sum() > counts["parsed_mdy"].sum())
+    else:
+        counts = pd.DataFrame({"parsed_mdy": 0, "parsed_dmy": 0}, index=prints.index)
+    single_key = rows.single_key
+
+    if state is not None and (meta["dayfirst"] != dates.dayfirst or meta["single_key"] != single_key):
+        # Cambió una decisión de todo el archivo: no hay nada reutilizable
+        state = None
+        changed = all_keys
+        changed_pos = np.arange(len(df))
+
+    sub_out, formats = process_keys(
+        df.iloc[changed_pos].reset_index(drop=True), date_mode, dates.dayfirst, single_key, dates.formats
+    )
+
+    outputs = {}
+    for name, idx in OUTPUT_COLUMNS.items():
+        values = np.empty(len(df), dtype=np.float64 if name == "J" else object)
+        values[changed_pos] = sub_out.iloc[:, idx].to_numpy()
+        outputs[name] = values
+
+    # Claves sin cambios: sus filas son idénticas y están en el mismo orden => se alinean por (clave, posición)
+    position = key_positions(keys)
+    reused_pos = np.setdiff1d(np.arange(len(df)), changed_pos, assume_unique=True)
+    if len(reused_pos):
+        wanted = pd.DataFrame({"key": keys[reused_pos], "position": position[reused_pos]})
+        aligned = wanted.merge(prev_rows, on=["key", "position"], how="left")
+        for name in OUTPUT_COLUMNS:
+            outputs[name][reused_pos] = aligned[name].to_numpy()
+
+    df_out = df.copy(deep=False)
+    for name, idx in OUTPUT_COLUMNS.items():
+        df_out.isetitem(idx, outputs[name])
+    resumen = build_summary_counts(df_out, rows=rows)
+
+    # Estado nuevo: solo las claves presentes en este archivo
+    bols = prints.join(counts)[["hash", "rows"] + COUNT_COLUMNS]
+    save_state(
+        state_dir,
+        {
+            "version": STATE_VERSION,
+            "date_mode": date_mode,
+            "columns": columns,
+            "dayfirst": dates.dayfirst,
+            "single_key": single_key,
+            "formats": {str(k): v for k, v in {**dates.formats, **formats}.items()},
+        },
+        bols,
+        pd.DataFrame({"key": keys, "position": position, **outputs}),
+    )
+
+    stats = {
+        "bols": int(len(prints)),
+        "bols_recalculados": int(len(changed)),
+        "filas_recalculadas": int(len(changed_pos)),
+        "completo": state is None,
+    }
+    return df_out, resumen, stats
@@ -0,0 +1,176 @@
+"""
+Motor paralelo: particiona las filas por clave BOL (col C limpia) y procesa cada
+partición en un proceso aparte.
+
+Cada partición tiene BOL completos, así que alcanza con tomar antes de particionar las
+decisiones de todo el archivo (file_decisions; por qué alcanza: ver app.run_pipeline).
+Cada partición corre N -> K/L -> J -> O con esas decisiones fijas; las columnas
+calculadas vuelven a su posición original y la Tabla Resumen se arma sobre el archivo
+completo (los BL únicos por col A se cuentan entre todas las particiones).
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from app import (
+    COMPACT_OUTPUT_COLUMNS,
+    IDX_B_SHIPMENT_TYPE,
+    IDX_C_BOL,
+    IDX_G_ESTIMATED,
+    IDX_H_ACTUAL,
+    IDX_J_DIFF_HOURS,
+    IDX_K_MIN,
+    IDX_L_MAX,
+    IDX_N_PRIORITIZED,
+    IDX_O_RANGE,
+    MIN_COLS_A_TO_O,
+    PROCESS_WORKERS,
+    DateStore,
+    PipelineProfile,
+    RowIndex,
+    build_summary_counts,
+    clean_date_values,
+    compact_dtypes,
+    process,
+    process_upload,
+    run_pipeline,
+    take_codes,
+)
+
+PARALLEL_MIN_ROWS = 200_000  # con menos filas el costo de los procesos supera la ganancia
+
+# Columnas que necesitan las etapas (K/L de entrada se conservan en filas que no son BOL ni CONTAINER)
+INPUT_COLUMNS = [IDX_B_SHIPMENT_TYPE, IDX_C_BOL, IDX_G_ESTIMATED, IDX_H_ACTUAL, IDX_K_MIN, IDX_L_MAX]
+OUTPUT_COLUMNS = [IDX_J_DIFF_HOURS, IDX_K_MIN, IDX_L_MAX, IDX_N_PRIORITIZED, IDX_O_RANGE]
+
+
+def partition_ids(rows: RowIndex, n_partitions: int) -> np.ndarray:
+    """Partición de cada fila: hash de la clave C; las filas con C en blanco se reparten por posición."""
+    per_key = (pd.util.hash_array(rows.bol_keys) % np.uint64(n_partitions)).astype(np.int64)
+    parts = take_codes(per_key, rows.bol_codes, fill=-1)
+    blank = parts < 0
+    parts[blank] = np.flatnonzero(blank) % n_partitions
+    return parts
+
+
+def file_decisions(df: pd.DataFrame, date_mode: str, rows: RowIndex) -> dict:
+    """
+    Decisiones de todo el archivo, iguales a las que toma process() sobre el archivo entero.
+    Los formatos de fecha se detectan acá (sobre los valores distintos, como DateStore);
+    en AUTO dayfirst queda en None y se decide con los conteos de cada partición (count_partition).
+    """
+    dates = DateStore(date_mode)
+    values = clean_date_values(pd.concat([df.iloc[:, IDX_H_ACTUAL], df.iloc[:, IDX_G_ESTIMATED]], ignore_index=True))
+    uniques = pd.Series(pd.factorize(values)[1], dtype=object)
+    modes = [False, True] if dates.dayfirst is None else [dates.dayfirst]
+    formats = {dayfirst: DateStore.detect_format(uniques, dayfirst) for dayfirst in modes}
+    return {"dayfirst": dates.dayfirst, "formats": formats, "single_key": rows.single_key}
+
+
+def count_partition(columns: dict, date_mode: str, formats: dict) -> dict:
+    """Corre en un proceso del pool: parseos MDY/DMY de G/H de una partición (para decidir AUTO)."""
+    dates = DateStore(date_mode, formats=formats)
+    values = pd.concat([columns[IDX_H_ACTUAL], columns[IDX_G_ESTIMATED]], ignore_index=True)
+    return dates.count_parsed(clean_date_values(values))
+
+
+def process_partition(columns: dict, n_rows: int, date_mode: str, decisions: dict) -> tuple[list, int]:
+    """
+    Corre en un proceso del pool: mismas etapas que app.process sobre las filas de una
+    partición, con las decisiones de todo el archivo fijas. Devuelve (J, K, L, N, O) y
+    la cantidad de fechas que necesitaron inferencia.
+    """
+    empty = np.full(n_rows, np.nan, dtype=object)
+    df = pd.DataFrame({pos: columns.get(pos, empty) for pos in range(MIN_COLS_A_TO_O)})
+
+    dates = DateStore.from_frame(df, date_mode, dayfirst=decisions["dayfirst"], formats=decisions["formats"])
+    df, dates, _ = run_pipeline(df, date_mode, dates=dates, single_key=decisions["single_key"])
+    return [df.iloc[:, pos].to_numpy() for pos in OUTPUT_COLUMNS], dates.fallback_count
+
+
+def partition_columns(df: pd.DataFrame, pos: np.ndarray) -> dict:
+    """Columnas de entrada de las filas `pos` (categóricas solo con sus categorías usadas)."""
+    columns = {}
+    for idx in INPUT_COLUMNS:
+        col = df.iloc[pos, idx]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            col = col.cat.remove_unused_categories()
+        columns[idx] = col.reset_index(drop=True)
+    return columns
+
+
+def process_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Pool de `workers` procesos spawn: la app corre dentro del servidor de Streamlit (con
+    hilos), donde fork no es seguro. Bajo `streamlit run` cada proceso re-ejecuta app.py
+    como __mp_main__, que no arma la UI.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def process_upload_job(raw: bytes, sep: str, has_header: bool, date_mode: str, arrow: bool = False) -> tuple:
+    """Corre en un proceso del pool: app.process_upload de un archivo (carga múltiple de la app)."""
+    return process_upload(raw, sep, has_header, date_mode, arrow=arrow)
+
+
+def process_parallel(
+    df: pd.DataFrame,
+    date_mode: str,
+    workers: int = PROCESS_WORKERS,
+    profile: PipelineProfile = None,
+    min_rows: int = PARALLEL_MIN_ROWS,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Como app.process (mismo resultado), repartiendo las filas en `workers` procesos.
+    Con 1 proceso, sin filas o con menos de `min_rows` filas usa app.process directamente.
+    """
+    if profile is None:
+        profile = PipelineProfile()
+    n = len(df)
+    # Sin filas no hay particiones (y el pool no admite 0 procesos), aun con min_rows=0
+    if workers <= 1 or n == 0 or n < min_rows:
+        return process(df, date_mode=date_mode, profile=profile)
+
+    with profile.stage("particiones", rows=n) as stage:
+        rows = RowIndex(df)
+        decisions = file_decisions(df, date_mode, rows)
+        parts = partition_ids(rows, workers)
+        order = np.argsort(parts, kind="stable")
+        bounds = np.searchsorted(parts[order], np.arange(workers + 1))
+        positions = [order[bounds[i]:bounds[i + 1]] for i in range(workers) if bounds[i + 1] > bounds[i]]
+        inputs = [partition_columns(df, pos) for pos in positions]
+        stage["procesos"] = len(positions)
+        stage["dayfirst"] = decisions["dayfirst"]
+
+    with process_pool(len(positions)) as pool:
+        if decisions["dayfirst"] is None:
+            with profile.stage("AUTO (MDY/DMY)", rows=n) as stage:
+                counts = list(pool.map(count_partition, inputs, repeat(date_mode), repeat(decisions["formats"])))
+                decisions["dayfirst"] = sum(c[True] for c in counts) > sum(c[False] for c in counts)
+                stage["dayfirst"] = decisions["dayfirst"]
+
+        with profile.stage(f"N/K/L/J/O ({len(positions)} procesos)", rows=n) as stage:
+            futures = [
+                pool.submit(process_partition, columns, len(pos), date_mode, decisions)
+                for columns, pos in zip(inputs, positions)
+            ]
+            results = [future.result() for future in futures]
+            stage["fallbacks_fecha"] = sum(fallbacks for _, fallbacks in results)
+    del inputs
+
+    with profile.stage("unir particiones", rows=n):
+        df_out = df.copy(deep=False)
+        for i, idx in enumerate(OUTPUT_COLUMNS):
+            values = np.empty(n, dtype=np.float64 if idx == IDX_J_DIFF_HOURS else object)
+            for pos, (outputs, _) in zip(positions, results):
+                values[pos] = outputs[i]
+            df_out.isetitem(idx, values)
+
+    with profile.stage("Tabla Resumen", rows=n):
+        resumen = build_summary_counts(df_out, rows=rows)
+    with profile.stage("dtypes compactos", rows=n):
+        df_out = compact_dtypes(df_out, COMPACT_OUTPUT_COLUMNS, copy=False)
+    return df_out, resumen
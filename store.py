@@ -0,0 +1,203 @@
+"""
+Almacén local de resultados procesados (SQLite, sin dependencias extra).
+
+Cada Archivo completo se guarda en la tabla `filas` con sus columnas A..O tal como se
+exportan (J como texto), más el Shipment ID (col A) y la clave BOL (col C) limpios, ambos
+indexados: buscar una lista de BOL lee solo esas filas, sin cargar el archivo completo.
+Cada archivo se identifica por su contenido (sha256 del CSV subido) y su nombre: guardar de
+nuevo el mismo archivo reemplaza sus filas, pero otro "export.csv" con distinto contenido
+(ej: de otro analista) se guarda aparte sin tocar el anterior. Nada se borra solo: ver
+delete_file y delete_saved_before.
+
+El archivo SQLite va en la variable de entorno REPORTE_STORE_PATH o, si no está, junto a
+este módulo (en instalaciones donde esa carpeta es de solo lectura, definir la variable).
+"""
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from itertools import repeat
+from pathlib import Path
+
+import pandas as pd
+
+from app import (
+    CSV_CHUNK_ROWS,
+    IDX_A_SHIPMENT_ID,
+    MIN_COLS_A_TO_O,
+    RowIndex,
+    clean_text_values,
+    take_codes,
+    to_display_frame,
+)
+
+STORE_PATH = Path(os.environ.get("REPORTE_STORE_PATH") or Path(__file__).with_name("resultados.sqlite"))
+STORE_COLUMNS = list("ABCDEFGHIJKLMNO")  # A..O; las columnas siguientes no se guardan
+LOOKUP_BATCH = 500  # valores por consulta (límite de parámetros de SQLite)
+SCHEMA_VERSION = 2  # 1: archivos único por nombre; 2: único por (sha256, nombre)
+
+ARCHIVOS_TABLE = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id INTEGER PRIMARY KEY,
+    nombre TEXT NOT NULL,
+    sha256 TEXT,
+    columnas TEXT NOT NULL,
+    filas INTEGER NOT NULL,
+    guardado TEXT NOT NULL,
+    UNIQUE (sha256, nombre)
+);
+"""
+
+SCHEMA = ARCHIVOS_TABLE.format(table="archivos") + f"""
+CREATE TABLE IF NOT EXISTS filas (
+    archivo_id INTEGER NOT NULL REFERENCES archivos (id),
+    fila INTEGER NOT NULL,
+    shipment_id TEXT,
+    bol TEXT,
+    {", ".join(f"{c} TEXT" for c in STORE_COLUMNS)}
+);
+CREATE INDEX IF NOT EXISTS filas_bol ON filas (bol);
+CREATE INDEX IF NOT EXISTS filas_shipment_id ON filas (shipment_id);
+CREATE INDEX IF NOT EXISTS filas_archivo ON filas (archivo_id, fila);
+"""
+
+
+def connect(path=STORE_PATH) -> sqlite3.Connection:
+    """Conexión con el esquema creado. WAL: la app puede buscar mientras otro proceso guarda."""
+    conn = sqlite3.connect(path, timeout=60)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        migrate(conn)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def migrate(conn: sqlite3.Connection) -> None:
+    """
+    Lleva un almacén de la versión 1 (nombre UNIQUE) a la actual conservando sus filas. Las
+    filas viejas sin sha256 quedan con NULL: no chocan con nada y no se reemplazan.
+    """
+    with conn:
+        old = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'archivos'").fetchone()
+        if old is not None:
+            # Recomendado por SQLite para cambiar restricciones: tabla nueva, copiar, borrar, renombrar
+            conn.execute(ARCHIVOS_TABLE.format(table="archivos_nueva"))
+            conn.execute("INSERT INTO archivos_nueva SELECT id, nombre, sha256, columnas, filas, guardado FROM archivos")
+            conn.execute("DROP TABLE archivos")
+            conn.execute("ALTER TABLE archivos_nueva RENAME TO archivos")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def store_rows(df: pd.DataFrame, start: int, rows: RowIndex, archivo_id: int):
+    """Tuplas de `filas` para un bloque del Archivo completo (None donde está en blanco)."""
+    chunk = to_display_frame(df.iloc[:, :MIN_COLS_A_TO_O])
+    n = len(chunk)
+    # Listas y no arrays de numpy: sqlite3 recorre listas de objetos Python bastante más rápido
+    columns = [
+        repeat(archivo_id, n),
+        range(start, start + n),
+        clean_text_values(chunk.iloc[:, IDX_A_SHIPMENT_ID]).tolist(),
+        take_codes(rows.bol_keys, rows.bol_codes[start:start + n], fill=None).tolist(),
+    ]
+    columns += [chunk.iloc[:, pos].to_numpy(dtype=object, na_value=None).tolist() for pos in range(MIN_COLS_A_TO_O)]
+    return zip(*columns)
+
+
+def save_result(df_out: pd.DataFrame, nombre: str, sha256: str, path=STORE_PATH, rows: RowIndex = None) -> int:
+    """
+    Guarda el Archivo completo `nombre` del CSV con hash `sha256` (ver app.file_sha256); solo
+    reemplaza un guardado anterior del mismo nombre y contenido. Devuelve las filas guardadas.
+    """
+    if rows is None:
+        rows = RowIndex(df_out)
+    headers = [str(c) for c in df_out.columns[:MIN_COLS_A_TO_O]]
+    placeholders = ", ".join("?" * (len(STORE_COLUMNS) + 4))
+    with closing(connect(path)) as conn, conn:
+        old = conn.execute("SELECT id FROM archivos WHERE sha256 = ? AND nombre = ?", (sha256, nombre)).fetchone()
+        if old is not None:
+            conn.execute("DELETE FROM filas WHERE archivo_id = ?", old)
+            conn.execute("DELETE FROM archivos WHERE id = ?", old)
+        archivo_id = conn.execute(
+            "INSERT INTO archivos (nombre, sha256, columnas, filas, guardado) VALUES (?, ?, ?, ?, ?)",
+            (nombre, sha256, json.dumps(headers, ensure_ascii=False), len(df_out), datetime.now().isoformat(timespec="seconds")),
+        ).lastrowid
+        for start in range(0, len(df_out), CSV_CHUNK_ROWS):
+            chunk = df_out.iloc[start:start + CSV_CHUNK_ROWS]
+            conn.executemany(f"INSERT INTO filas VALUES ({placeholders})", store_rows(chunk, start, rows, archivo_id))
+    return len(df_out)
+
+
+def list_files(path=STORE_PATH) -> pd.DataFrame:
+    """Archivos guardados (id, nombre, sha256, filas, fecha de guardado), el más reciente primero."""
+    if not Path(path).exists():
+        return pd.DataFrame(columns=["id", "nombre", "sha256", "filas", "guardado"])
+    with closing(connect(path)) as conn:
+        return pd.read_sql_query(
+            "SELECT id, nombre, sha256, filas, guardado FROM archivos ORDER BY guardado DESC, id DESC", conn
+        )
+
+
+def delete_file(archivo_id: int, path=STORE_PATH) -> int:
+    """Borra el archivo `archivo_id` (columna id de list_files) con sus filas. Devuelve las filas borradas."""
+    with closing(connect(path)) as conn, conn:
+        conn.execute("DELETE FROM archivos WHERE id = ?", (int(archivo_id),))
+        return conn.execute("DELETE FROM filas WHERE archivo_id = ?", (int(archivo_id),)).rowcount
+
+
+def delete_saved_before(before: str, path=STORE_PATH) -> int:
+    """
+    Retención: borra los archivos guardados antes de `before` (fecha u hora ISO, ej:
+    "2024-06-30"). Devuelve cuántos archivos se borraron.
+    """
+    if not Path(path).exists():
+        return 0
+    with closing(connect(path)) as conn, conn:
+        ids = [row[0] for row in conn.execute("SELECT id FROM archivos WHERE guardado < ?", (before,))]
+        conn.executemany("DELETE FROM filas WHERE archivo_id = ?", [(i,) for i in ids])
+        conn.executemany("DELETE FROM archivos WHERE id = ?", [(i,) for i in ids])
+    return len(ids)
+
+
+def lookup(column: str, values, path=STORE_PATH, nombre: str = None, sha256: str = None) -> pd.DataFrame:
+    """
+    Filas guardadas cuyo `column` ("bol" o "shipment_id", valores limpios) está en `values`.
+    Columnas: archivo, sha256, fila y A..O; ordenadas por archivo (nombre), id del guardado
+    (columna id de list_files) y fila. `nombre` y `sha256` limitan a los archivos con ese
+    nombre / contenido.
+    """
+    if column not in ("bol", "shipment_id"):
+        raise ValueError(f"Columna de búsqueda inválida: {column}")
+    wanted = list(dict.fromkeys(v for v in clean_text_values(pd.Series(list(values), dtype=object)) if v is not None))
+    columns = ["archivo", "sha256", "fila"] + STORE_COLUMNS
+    if not wanted or not Path(path).exists():
+        return pd.DataFrame(columns=columns)
+
+    filters = {"nombre": nombre, "sha256": sha256}
+    filters = {c: v for c, v in filters.items() if v is not None}
+    where_file = "".join(f" AND a.{c} = ?" for c in filters)
+    frames = []
+    with closing(connect(path)) as conn:
+        for start in range(0, len(wanted), LOOKUP_BATCH):
+            batch = wanted[start:start + LOOKUP_BATCH]
+            query = (
+                f"SELECT a.nombre AS archivo, a.sha256, a.id AS archivo_id, f.fila, {', '.join(f'f.{c}' for c in STORE_COLUMNS)} "
+                f"FROM filas f JOIN archivos a ON a.id = f.archivo_id "
+                f"WHERE f.{column} IN ({', '.join('?' * len(batch))}){where_file}"
+            )
+            params = batch + list(filters.values())
+            frames.append(pd.read_sql_query(query, conn, params=params))
+    found = pd.concat(frames, ignore_index=True)
+    # archivo_id: las filas de dos guardados con el mismo nombre no se intercalan
+    return found.sort_values(["archivo", "archivo_id", "fila"], kind="stable", ignore_index=True)[columns]
+
+
+def lookup_bols(bols, path=STORE_PATH, nombre: str = None, sha256: str = None) -> pd.DataFrame:
+    """Filas guardadas (BILL_OF_LADING y CONTAINER) de los BOL (col C) de la lista."""
+    return lookup("bol", bols, path=path, nombre=nombre, sha256=sha256)
+
+
+def lookup_shipments(shipment_ids, path=STORE_PATH, nombre: str = None, sha256: str = None) -> pd.DataFrame:
+    """Filas guardadas de los Shipment ID (col A) de la lista."""
+    return lookup("shipment_id", shipment_ids, path=path, nombre=nombre, sha256=sha256)
@@ -0,0 +1,263 @@
+"""
+Modo streaming (dos pasadas) para CSV más grandes que la memoria.
+
+- En AUTO, antes: lee solo G/H y cuenta cuántas fechas calzan con el formato MDY y
+  con el DMY detectados, para decidir dayfirst sin convertir fechas en ambos órdenes.
+- Pasada 1: lee por bloques y acumula, por BOL (col C), los agregados de sus
+  contenedores: H mínima, G mínima (y primera H/G), N mínima/máxima.
+  También registra si el archivo tiene 1 único C.
+- Pasada 2: vuelve a leer por bloques, completa N/K/L/J/O con esos agregados,
+  escribe la salida bloque a bloque y acumula la Tabla Resumen.
+
+La memoria depende de la cantidad de BOLs, no de la cantidad de filas.
+"""
+import pandas as pd
+
+from app import (
+    IDX_A_SHIPMENT_ID,
+    IDX_G_ESTIMATED,
+    IDX_H_ACTUAL,
+    IDX_N_PRIORITIZED,
+    MIN_COLS_A_TO_O,
+    DateStore,
+    RowIndex,
+    build_summary_counts,
+    clean_date_values,
+    clean_text_values,
+    compute_valor_priorizado,
+    ensure_min_columns,
+    resolve_bol_n,
+    run_pipeline,
+    sniff_delimiter,
+    to_display_frame,
+)
+
+DEFAULT_CHUNKSIZE = 200_000
+
+
+class ExtremeByKey:
+    """Valor con fecha mínima/máxima por clave, acumulado entre bloques (empate: primera aparición)."""
+
+    def __init__(self, how: str):
+        self.how = how
+        self.state = None  # DataFrame key/val/dt, una fila por clave
+
+    def update(self, keys: pd.Series, values: pd.Series, dts: pd.Series) -> None:
+        valid = dts.notna().to_numpy()
+        chunk = pd.DataFrame({
+            "key": keys.to_numpy()[valid],
+            "val": values.to_numpy()[valid],
+            "dt": dts.to_numpy()[valid],
+        })
+        if chunk.empty:
+            return
+
+        # El estado va primero: en empate gana la aparición más temprana del archivo
+        frame = chunk if self.state is None else pd.concat([self.state, chunk], ignore_index=True)
+        grouped = frame.groupby("key", sort=False)["dt"]
+        pos = grouped.idxmin() if self.how == "min" else grouped.idxmax()
+        self.state = frame.iloc[pos.to_numpy()].reset_index(drop=True)
+
+    def result(self) -> pd.Series:
+        if self.state is None:
+            return pd.Series(dtype=object)
+        return pd.Series(self.state["val"].to_numpy(), index=self.state["key"].to_numpy(), dtype=object)
+
+
+class FirstByKey:
+    """Primer valor no nulo por clave, acumulado entre bloques."""
+
+    def __init__(self):
+        self.state = pd.Series(dtype=object)
+
+    def update(self, keys: pd.Series, values: pd.Series) -> None:
+        valid = values.notna().to_numpy()
+        chunk_first = pd.Series(values.to_numpy()[valid], index=keys.to_numpy()[valid], dtype=object)
+        chunk_first = chunk_first[~chunk_first.index.duplicated(keep="first")]
+        new = chunk_first[~chunk_first.index.isin(self.state.index)]
+        if len(new):
+            self.state = pd.concat([self.state, new]) if len(self.state) else new
+
+    def result(self) -> pd.Series:
+        return self.state
+
+
+class ContainerAggregates:
+    """Agregados por BOL de sus contenedores."""
+
+    def __init__(self):
+        self.h_min = ExtremeByKey("min")
+        self.g_min = ExtremeByKey("min")
+        self.n_min = ExtremeByKey("min")
+        self.n_max = ExtremeByKey("max")
+
+
+def iter_chunks(path, sep: str, has_header: bool, chunksize: int):
+    reader = pd.read_csv(
+        path,
+        sep=sep,
+        header=0 if has_header else None,
+        dtype=str,
+        keep_default_na=True,
+        encoding="utf-8-sig",
+        encoding_errors="replace",
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        yield ensure_min_columns(chunk, has_header, copy=False)
+
+
+def count_dayfirst(path, sep: str, has_header: bool, chunksize: int = DEFAULT_CHUNKSIZE) -> bool:
+    """
+    AUTO: dayfirst de todo el archivo, leyendo solo G/H. Por bloque cuenta los valores que
+    calzan con el formato MDY y con el DMY detectados (DateStore.count_parsed), sin inferir.
+    """
+    options = {"sep": sep, "dtype": str, "keep_default_na": True, "encoding": "utf-8-sig", "encoding_errors": "replace"}
+    # Si el archivo no llega a G/H, esas columnas quedan en blanco (ver ensure_min_columns)
+    n_columns = pd.read_csv(path, header=None, nrows=1, **options).shape[1]
+    usecols = [idx for idx in (IDX_G_ESTIMATED, IDX_H_ACTUAL) if idx < n_columns]
+    if not usecols:
+        return False
+
+    reader = pd.read_csv(path, header=0 if has_header else None, usecols=usecols, chunksize=chunksize, **options)
+    parse_counts = {False: 0, True: 0}
+    for chunk in reader:
+        values = clean_date_values(pd.concat([chunk.iloc[:, i] for i in range(chunk.shape[1])], ignore_index=True))
+        # Un DateStore por bloque: la caché de fechas no crece con el archivo
+        counts = DateStore("AUTO").count_parsed(values)
+        for dayfirst in (False, True):
+            parse_counts[dayfirst] += counts[dayfirst]
+    return parse_counts[True] > parse_counts[False]
+
+
+def scan_containers(path, sep: str, has_header: bool, date_mode: str, chunksize: int = DEFAULT_CHUNKSIZE) -> dict:
+    """
+    Pasada 1. Devuelve lo necesario para la pasada 2:
+    dayfirst resuelto, bol_to_n, min_map, max_map y single_key.
+    """
+    if date_mode == "AUTO":
+        dayfirst = count_dayfirst(path, sep, has_header, chunksize)
+    else:
+        dayfirst = date_mode == "DMY"
+    agg = ContainerAggregates()
+    h_first = FirstByKey()
+    g_first = FirstByKey()
+    container_keys = {}
+    nonblank_keys = set()
+
+    for chunk in iter_chunks(path, sep, has_header, chunksize):
+        chunk = compute_valor_priorizado(chunk, copy=False)
+        rows = RowIndex(chunk)
+        if len(nonblank_keys) < 2:
+            nonblank_keys.update(rows.bol_keys[:2])
+
+        cont = rows.mask_container & (rows.bol_codes >= 0)
+        if not cont.any():
+            continue
+
+        # Entre bloques los códigos de RowIndex no coinciden: los agregados usan la clave (string)
+        keys = pd.Series(rows.bol_keys[rows.bol_codes[cont]])
+        h = clean_date_values(chunk.iloc[:, IDX_H_ACTUAL][cont]).reset_index(drop=True)
+        g = clean_date_values(chunk.iloc[:, IDX_G_ESTIMATED][cont]).reset_index(drop=True)
+        n = clean_date_values(chunk.iloc[:, IDX_N_PRIORITIZED][cont]).reset_index(drop=True)
+
+        container_keys.update(dict.fromkeys(pd.unique(keys)))
+        h_first.update(keys, h)
+        g_first.update(keys, g)
+
+        # Un DateStore por bloque: la caché de fechas no crece con el archivo
+        dates = DateStore(date_mode, dayfirst=dayfirst)
+        agg.h_min.update(keys, h, dates.to_datetime(h))
+        agg.g_min.update(keys, g, dates.to_datetime(g))
+        n_dt = dates.to_datetime(n)
+        agg.n_min.update(keys, n, n_dt)
+        agg.n_max.update(keys, n, n_dt)
+
+    keys = list(container_keys)
+    return {
+        "dayfirst": dayfirst,
+        "bol_to_n": resolve_bol_n(
+            keys, agg.h_min.result(), h_first.result(), agg.g_min.result(), g_first.result()
+        ).to_dict(),
+        "min_map": agg.n_min.result().reindex(keys).fillna("No Valido").to_dict(),
+        "max_map": agg.n_max.result().reindex(keys).fillna("No Valido").to_dict(),
+        "single_key": len(nonblank_keys) == 1,
+    }
+
+
+def process_chunk(chunk: pd.DataFrame, date_mode: str, scan: dict) -> pd.DataFrame:
+    """Pasada 2 sobre un bloque: mismas etapas que app.process, con los agregados de la pasada 1."""
+    # El bloque es propio (recién leído): las etapas escriben sobre él sin copiar
+    df_out, _, _ = run_pipeline(
+        chunk,
+        date_mode,
+        dates=DateStore.from_frame(chunk, date_mode, dayfirst=scan["dayfirst"]),
+        single_key=scan["single_key"],
+        bol_to_n=scan["bol_to_n"],
+        min_map=scan["min_map"],
+        max_map=scan["max_map"],
+    )
+    return df_out
+
+
+class SummaryAccumulator:
+    """Tabla Resumen acumulada por bloques (BL único por col A en todo el archivo)."""
+
+    def __init__(self):
+        self.seen = set()
+        self.totals = None
+
+    def update(self, df_out: pd.DataFrame) -> None:
+        mask_bol = RowIndex(df_out).mask_bol
+        bl_id = clean_text_values(df_out.iloc[:, IDX_A_SHIPMENT_ID])
+
+        # Los BL ya contados en bloques anteriores no se vuelven a contar
+        keep = ~(mask_bol & bl_id.isin(self.seen))
+        counts = build_summary_counts(df_out.loc[keep])
+        self.seen.update(bl_id[mask_bol].dropna())
+
+        if self.totals is None:
+            self.totals = counts
+        else:
+            self.totals["valor"] = self.totals["valor"] + counts["valor"]
+
+    def result(self) -> pd.DataFrame:
+        if self.totals is None:
+            return build_summary_counts(pd.DataFrame(columns=range(MIN_COLS_A_TO_O)))
+        return self.totals
+
+
+def process_streaming(
+    input_path,
+    output_path,
+    date_mode: str = "AUTO",
+    sep: str = None,
+    has_header: bool = True,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> pd.DataFrame:
+    """
+    Procesa `input_path` en dos pasadas, escribiendo "Archivo completo" en `output_path`
+    bloque a bloque. Devuelve la Tabla Resumen.
+    """
+    if sep is None:
+        with open(input_path, encoding="utf-8-sig", errors="replace") as f:
+            sep = sniff_delimiter(f.read(65536))
+
+    scan = scan_containers(input_path, sep, has_header, date_mode, chunksize=chunksize)
+    summary = SummaryAccumulator()
+
+    first = True
+    for chunk in iter_chunks(input_path, sep, has_header, chunksize):
+        df_out = process_chunk(chunk, date_mode, scan)
+        summary.update(df_out)
+        to_display_frame(df_out).to_csv(
+            output_path,
+            index=False,
+            sep=sep,
+            header=has_header and first,
+            mode="w" if first else "a",
+            encoding="utf-8-sig" if first else "utf-8",
+        )
+        first = False
+
+    return summary.result()